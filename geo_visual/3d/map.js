@@ -1,4 +1,6 @@
-var dataUrl = 'https://raw.githubusercontent.com/cloudmesh/metric/master/geo_visual/data-coords.csv';
+// organizations aggregated per zoom level, see build_tiles.py
+var dataUrl = 'https://raw.githubusercontent.com/cloudmesh/metric/master/geo_visual/tiles/zoom-{zoom}.csv';
+var zooms = [3, 4, 5, 6, 7];
 var symbolColor = 'yellow';
 var basemap = 'dark-gray';
 var proxy = 'raw.githubusercontent.com';
@@ -24,7 +26,7 @@ require([
 ) {
 
   var objectSymbol,
-    objectSymbolRenderer, csvLayer, labelClass;
+    objectSymbolRenderer, csvLayer, labelClass, level;
 
   // Create the Map
   var map = new Map({
@@ -91,25 +93,41 @@ require([
   });
   
   esriConfig.request.corsEnabledServers.push(proxy);
-    
-  csvLayer = new CSVLayer({
-    url: dataUrl,
-    renderer: objectSymbolRenderer,
-    popupTemplate: popupTemplate,
-    longitudeField: 'location_longitude',
-    latitudeField: 'location_latitude',
-    maxScale: 0,
-    minScale: 0,
-    labelsVisible: true,
-    labelingInfo: [labelClass]
-  });
   
   var popupTemplate = {
     title: '{Organization}',
     content: 'Number of publications: {# of Pubs}'
   };
   
-  csvLayer.popupTemplate = popupTemplate;
+  // replace the layer with the aggregated organizations of a zoom level
+  function showLevel(zoom) {
+    zoom = Math.max(zooms[0], Math.min(zooms[zooms.length - 1], Math.round(zoom)));
+    
+    if(zoom == level) {
+      return;
+    }
+    
+    level = zoom;
+    
+    if(csvLayer) {
+      map.remove(csvLayer);
+    }
+    
+    csvLayer = new CSVLayer({
+      url: dataUrl.replace('{zoom}', level),
+      renderer: objectSymbolRenderer,
+      popupTemplate: popupTemplate,
+      longitudeField: 'location_longitude',
+      latitudeField: 'location_latitude',
+      maxScale: 0,
+      minScale: 0,
+      labelsVisible: true,
+      labelingInfo: [labelClass]
+    });
+    
+    map.add(csvLayer);
+  }
   
-  map.add(csvLayer);
+  showLevel(view.zoom);
+  view.watch('zoom', showLevel);
 });
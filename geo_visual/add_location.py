@@ -1,15 +1,52 @@
+'''Add IPEDS institution locations to organization data
+
+Usage:
+  add_location.py [--batch --review=<file> --cache=<file> --min-score=<score>]
+
+Options:
+  --batch              resolve unambiguous matches by score instead of asking
+  --review=<file>      where batch mode writes the candidates of its matches [default: review.csv]
+  --cache=<file>       selected matches, reused by later runs [default: decisions.json]
+  --min-score=<score>  lowest share of common significant words accepted in batch mode [default: 0.8]
+'''
+
 import csv
+from collections import OrderedDict
+from docopt import docopt
+from org_matcher import OrgMatcher, DecisionCache
 
 class AddLocation:
     biblio_file = 'data.csv'
     stats_file = 'hd2015.csv'
+    coords_file = 'data-coords.csv'
+    # IPEDS columns kept in memory
+    stats_columns = ['UNITID', 'INSTNM', 'ADDR', 'CITY', 'STABBR', 'ZIP', 'LONGITUD', 'LATITUDE']
+    # output field: IPEDS column
+    location_fields = OrderedDict([('location_street', 'ADDR'), ('location_city', 'CITY'), ('location_state', 'STABBR'),
+        ('location_zip', 'ZIP'), ('location_longitude', 'LONGITUD'), ('location_latitude', 'LATITUDE')])
     
-    def __init__(self):
+    def __init__(self, batch = False, review = 'review.csv', cache = 'decisions.json', min_score = .8):
+        '''
+        Args:
+            batch (bool) -- resolve unambiguous matches by score instead of asking
+            review (string) -- file for the candidates of matches made or left unresolved in batch mode
+            cache (string) -- JSON file of selected matches
+            min_score (float) -- lowest score accepted in batch mode
+        '''
+        self.batch = batch
+        self.review = review
+        self.min_score = float(min_score)
+        self.decisions = DecisionCache(cache)
+        self.unresolved = []
+        self.resolved = []
+        
         self.get_stats()
         self.add_location()
+        self.decisions.save()
+        self.write_review()
         
     def get_stats(self):
-        '''create list of dicts of stats from National Center for Education Statistics
+        '''Load the location columns of institutions from National Center for Education Statistics
         '''
         print 'Getting statistics data ...'
         self.stats_rows = []
@@ -17,43 +54,34 @@ class AddLocation:
             stats_rows = csv.DictReader(s)
             
             for row in stats_rows:
-                self.stats_rows.append(row)
+                self.stats_rows.append(dict((column, row[column]) for column in self.stats_columns))
+                
+        self.matcher = OrgMatcher(self.stats_rows)
 
     def add_location(self):
-        '''Add location data to biblio data
+        '''Add location data to biblio data, one row at a time
         '''
         print 'Updating bibliography data ...'
-        with open(self.biblio_file, 'rb') as b:
+        with open(self.biblio_file, 'rb') as b, open(self.coords_file, 'wb') as c:
             biblio_rows = csv.DictReader(b)
             
-            new_csv = []
+            fields = biblio_rows.fieldnames + [f for f in self.location_fields if f not in biblio_rows.fieldnames]
+            dict_writer = csv.DictWriter(c, fieldnames = fields)
+            dict_writer.writeheader()
+            
             update = 0
-            fields = []
             for row in biblio_rows:
                 match = self.find_match(row['Organization'])
                 
                 if(match):
                     update += 1
-                    row['location_street'] = match['ADDR']
-                    row['location_city'] = match['CITY']
-                    row['location_state'] = match['STABBR']
-                    row['location_zip'] = match['ZIP']
-                    row['location_longitude'] = match['LONGITUD']
-                    row['location_latitude'] = match['LATITUDE']
-                    
-                    if(len(fields) < row.keys()):
-                        fields = row.keys()
-   
-                new_csv.append(row)
+                    for field, column in self.location_fields.iteritems():
+                        row[field] = match[column]
+                        
+                dict_writer.writerow(row)
                 
-            print 'Updated ' + str(update) + ' rows, saving data-coords.csv ...'
-                
-            with open('data-coords.csv', 'wb') as c:
-                dict_writer = csv.DictWriter(c, fieldnames = fields)
-                dict_writer.writeheader()
-                dict_writer.writerows(new_csv)
-                
-            print 'Complete.'
+        print 'Updated ' + str(update) + ' rows, saved ' + self.coords_file + '.'
+        print 'Complete.'
             
     def find_match(self, org):
         '''Check whether organizations name match, disregarding punctuation and word order
@@ -62,62 +90,83 @@ class AddLocation:
         Returns:
             (dict) -- matching organization details
         '''
+        match = self.matcher.exact(org)
         
-        replace  = {',': '', ' of ': ' ', ' at ': ' ', '-': ' ', 'Main Campus': '', ' and ': ' ', ' in ': ' ', '.': '', ' the ': ' ', 'The ': '', ' for ': ' ', ' & ': '', '&': ''}
-        
-        ignore = ['state', 'university', 'school', 'medicine', 'science', 'technology', 'college', 'medical', 'institute', 'research', 'health', 'system', 'office', 'national', 'sciences', 'center', 'campus', 'city']
-        
-        org_name = org
-        for k, v in replace.iteritems():
-            org_name = org_name.replace(k, v)
+        if(match):
+            return match
             
-        org_list = org_name.lower().strip().split()
-        
-        matches = []
-        for row in self.stats_rows: 
-            stat_org = row['INSTNM']
+        # decision of an earlier run, unless the institution is gone
+        if(org in self.decisions):
+            unitid = self.decisions.get(org)
+            match = self.matcher.get(unitid)
             
-            if(org == stat_org):
-                return row
+            if(unitid is None or match):
+                return match or {}
             
-            for k, v in replace.iteritems():
-                stat_org = stat_org.replace(k, v)
+        matches = self.matcher.candidates(org)
+        
+        if(not matches):
+            return {}
             
-            stat_list = stat_org.lower().strip().split()
+        # batch matches are only reviewed, never stored as decisions
+        if(self.batch):
+            match = self.matcher.resolve(org, matches, self.min_score)
             
-            if(org_name == stat_org or set(org_list) == set(stat_list)):
-                return row
+            if(match):
+                self.resolved.append((org, matches, match))
+            else:
+                self.unresolved.append((org, matches, None))
+                
+            return match or {}
             
-            match_words = []
-            for word in org_list:
-                if(word in stat_list):
-                    match_words.append(word)
-                  
-            if(len(match_words) >= 2):
-                for word in match_words:
-                    if word not in ignore:
-                        matches.append(row)
-                        break
-                             
         if(len(matches) == 1):
-            return matches[0]
-        elif(len(matches) > 1):
-            matches = sorted(matches, key = lambda k: k['INSTNM'])
-            print
-            print 'Organization: ' + org
-            count = 0
-            for match in matches:
-                print str(count) + ') ' + match['INSTNM']
-                count += 1
-            
-            selection = raw_input('Select the matching organization or None: ')
-            selection = int(selection) if selection else -1
+            return matches[0][1]
             
-            if(0 <= selection < len(matches)):
-                return matches[selection]
-            else:
-                return {}
+        match = self.select(org, matches)
+        self.decisions.set(org, match['UNITID'] if match else None)
+        return match or {}
+        
+    def select(self, org, matches):
+        '''Ask which candidate matches
+        Args:
+            org (string) -- organization name
+            matches (list) -- (score, institution) candidates
+        Returns:
+            (dict) -- selected institution, None if none was selected
+        '''
+        print
+        print 'Organization: ' + org
+        count = 0
+        for score, match in matches:
+            print str(count) + ') ' + match['INSTNM'] + ' ({:.2f})'.format(score)
+            count += 1
+        
+        selection = raw_input('Select the matching organization or None: ')
+        selection = int(selection) if selection else -1
+        
+        if(0 <= selection < len(matches)):
+            return matches[selection][1]
         else:
-            return {}
+            return None
+            
+    def write_review(self):
+        '''Write candidates of the matches made or left unresolved in batch mode,
+        the chosen candidate of a match is marked
+        '''
+        if(not self.unresolved and not self.resolved):
+            return
+            
+        print str(len(self.resolved)) + ' organizations matched by score, ' + str(len(self.unresolved)) + ' unresolved, saving ' + self.review + ' ...'
+        
+        with open(self.review, 'wb') as r:
+            writer = csv.writer(r)
+            writer.writerow(['Organization', 'key', 'UNITID', 'INSTNM', 'score', 'chosen'])
+            
+            for org, matches, chosen in self.unresolved + self.resolved:
+                for score, match in matches:
+                    writer.writerow([org, OrgMatcher.normalize(org), match['UNITID'], match['INSTNM'], '{:.2f}'.format(score), 'x' if match is chosen else ''])
         
-AddLocation()       
+if(__name__ == '__main__'):
+    arguments = docopt(__doc__)
+    AddLocation(batch = arguments['--batch'], review = arguments['--review'], cache = arguments['--cache'], min_score = arguments['--min-score'])
+       
@@ -1,40 +1,46 @@
 var map = Highcharts.maps['countries/us/us-all'];
+var tilesUrl = '../tiles/';
 var chart;
-    
-Highcharts.data({
-    googleSpreadsheetKey: '1HiakX48K_7LvPk6a0eCOjHfjQj0PnJgqDVmNMaiOj1c',
-    
-    parsed: function(columns){
-        var metricSelect = document.getElementById('metricSelect');
-        for(var i = 1, max = columns.length; i < max; i++){
-    		if(! columns[i][0].startsWith('location_')){
-                  var option = document.createElement('option');
-                  option.text = columns[i][0];
-                  metricSelect.add(option);
-            }
-        }
-        
-        metricSelect.addEventListener("change", function(evt){
-            selected = metricSelect.options[metricSelect.selectedIndex].text;
-            data = scrubData(columns, keyName(selected));
-            chart.series[2].setData(data, true);
-            chart.series[2].update({tooltip: {pointFormat: '{point.organization}<br>' + selected + ': {point.z}'}});
-            chart.setTitle({text: selected});
-        });
-        
+var index;
+var level;
+var tiles = {};
+
+$.getJSON(tilesUrl + 'index.json', function(tileIndex){
+    index = tileIndex;
+    level = index.zooms[0];
+
+    var metricSelect = document.getElementById('metricSelect');
+    for(var i = 0, max = index.metrics.length; i < max; i++){
+        var option = document.createElement('option');
+        option.text = index.metrics[i];
+        metricSelect.add(option);
+    }
+
+    metricSelect.addEventListener("change", function(evt){
+        var selected = metricSelect.options[metricSelect.selectedIndex].text;
+        showLevel(level);
+        chart.series[2].update({tooltip: {pointFormat: '{point.organization}<br>' + selected + ': {point.z}'}});
+        chart.setTitle({text: selected});
+    });
+
+    loadLevel(level, function(features){
         var metric = metricSelect.options[metricSelect.selectedIndex].text;
-        
-        var data = scrubData(columns, metric);
 
         chart = Highcharts.mapChart('container', {
             title: {
                 text: metric
             },
-            
+
             mapNavigation: {
                 enabled: true
             },
 
+            xAxis: {
+                events: {
+                    afterSetExtremes: zoomChanged
+                }
+            },
+
             series: [{
                 name: 'Basemap',
                 mapData: map,
@@ -54,53 +60,79 @@ Highcharts.data({
                 },
                 type: 'mapbubble',
                 name: 'Organizations',
-                data: data,
+                data: scrubData(features, metric),
                 maxSize: '12%',
                 color: Highcharts.getOptions().colors[0]
             }]
         });
-    }
+    });
 });
 
+/**
+ * loads the aggregated organizations of a zoom level, once
+ * @param {Number} zoom
+ * @param {Function} callback -- called with the GeoJSON features
+ */
+function loadLevel(zoom, callback){
+    if(tiles[zoom]){
+        callback(tiles[zoom]);
+        return;
+    }
+
+    $.getJSON(tilesUrl + 'zoom-' + zoom + '.geojson', function(collection){
+        tiles[zoom] = collection.features;
+        callback(tiles[zoom]);
+    });
+}
+
+/**
+ * replaces the bubbles with the organizations of a zoom level
+ * @param {Number} zoom
+ */
+function showLevel(zoom){
+    loadLevel(zoom, function(features){
+        var metricSelect = document.getElementById('metricSelect');
+        var metric = metricSelect.options[metricSelect.selectedIndex].text;
+        chart.series[2].setData(scrubData(features, metric), true, false);
+    });
+}
+
+/**
+ * picks the zoom level matching the visible part of the map
+ * @param {Object} evt -- axis extremes
+ */
+function zoomChanged(evt){
+    var full = evt.dataMax - evt.dataMin;
+    var visible = evt.max - evt.min;
+    var zooms = index.zooms;
+    var zoom = zooms[0] + Math.round(Math.log(full / visible) / Math.LN2);
+    zoom = Math.max(zooms[0], Math.min(zooms[zooms.length - 1], zoom));
+
+    if(zoom != level){
+        level = zoom;
+        showLevel(level);
+    }
+}
+
 /**
  * generates map data with 'z' variable, based on chosen metric
- * @param {Array} columns
+ * @param {Array} features -- GeoJSON point features
  * @param {String} metric
  * @return {Object} data
  */
-function scrubData(columns, metric){
+function scrubData(features, metric){
     var data = [];
-    for(var i = 1, rows = columns[0].length; i < rows; i++){
-        obj = {}
-        
-        for(var j = 0, cols = columns.length; j < cols; j++){
-            key = keyName(columns[j][0]);
-            value = columns[j][i];
-
-            if(key == keyName(metric)){
-                obj['z'] = value;
-            } else if(key == 'location_latitude') {
-                obj['lat'] = value;
-            } else if(key == 'location_longitude') {
-                obj['lon'] = value;
-            } else{
-                obj[key] = value;
-            }
-        }
-        
-        if(obj['lat'] && obj['lon']){
-            data.push(obj);
-        }
+    for(var i = 0, rows = features.length; i < rows; i++){
+        var properties = features[i].properties;
+
+        data.push({
+            lon: features[i].geometry.coordinates[0],
+            lat: features[i].geometry.coordinates[1],
+            z: properties[metric],
+            organization: properties['Organization'],
+            organizations: properties['organizations']
+        });
     }
-    
+
     return data;
 }
-
-/**
- * modifies metric to be useable with dot notation
- * @param {String} key
- * @return {String}
- */
-function keyName(key){
-    return key.replace('#', 'number').replace(/\s/g, '_').toLowerCase();   
-};
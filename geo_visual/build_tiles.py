@@ -0,0 +1,160 @@
+'''Aggregate organizations into map bins for several zoom levels
+
+Usage:
+  build_tiles.py [--input=<file> --output=<dir> --zooms=<zooms> --cell=<pixels>]
+
+Options:
+  --input=<file>    organizations with locations [default: data-coords.csv]
+  --output=<dir>    directory for the aggregated files [default: tiles]
+  --zooms=<zooms>   comma separated zoom levels [default: 3,4,5,6,7]
+  --cell=<pixels>   bin size in screen pixels (256 per tile) [default: 64]
+'''
+
+import csv, json, math, os
+from docopt import docopt
+
+class TileBuilder:
+    '''Bin organizations on a Web Mercator grid, one grid per zoom level
+
+    Each bin becomes one point at the mean location of its organizations.
+    Counts (# of Pubs, Cited by, ...) are summed and indices (H-index, ...)
+    take the largest value in the bin. Every zoom level is written as
+    GeoJSON (bubble map) and as CSV (3d map).
+    '''
+    name_field = 'Organization'
+    lon_field = 'location_longitude'
+    lat_field = 'location_latitude'
+
+    def __init__(self, filename):
+        '''
+        Args:
+            filename (string) -- csv of organizations with location_* columns
+        '''
+        self.orgs = []
+
+        with open(filename, 'rb') as f:
+            rows = csv.DictReader(f)
+            self.metrics = [c for c in rows.fieldnames if c != self.name_field and not c.startswith('location_')]
+
+            for row in rows:
+                lon, lat = number(row[self.lon_field]), number(row[self.lat_field])
+
+                # IPEDS marks missing coordinates with '.'
+                if(lon is None or lat is None):
+                    continue
+
+                org = {'name': row[self.name_field], 'lon': lon, 'lat': lat}
+                org['metrics'] = dict((m, number(row[m]) or 0) for m in self.metrics)
+                self.orgs.append(org)
+
+    def aggregate(self, zoom, cell = 64):
+        '''Bin organizations for a zoom level
+        Args:
+            zoom (int) -- zoom level, the world is 256 * 2 ** zoom pixels wide
+            cell (int) -- bin size in pixels
+        Returns:
+            (list) -- bins, largest # of Pubs first
+        '''
+        size = 256 * 2 ** zoom / float(cell)
+        bins = {}
+
+        for org in self.orgs:
+            x, y = mercator(org['lon'], org['lat'])
+            key = (int(x * size), int(y * size))
+            bins.setdefault(key, []).append(org)
+
+        aggregated = []
+        for orgs in bins.itervalues():
+            point = {
+                self.name_field: orgs[0]['name'] if len(orgs) == 1 else '{} organizations'.format(len(orgs)),
+                'organizations': len(orgs),
+                'lon': round(sum(o['lon'] for o in orgs) / len(orgs), 4),
+                'lat': round(sum(o['lat'] for o in orgs) / len(orgs), 4),
+            }
+
+            for metric in self.metrics:
+                values = [o['metrics'][metric] for o in orgs]
+                point[metric] = max(values) if 'index' in metric else sum(values)
+                point[metric] = int(point[metric]) if float(point[metric]).is_integer() else round(point[metric], 3)
+
+            aggregated.append(point)
+
+        return sorted(aggregated, key = lambda p: -p.get('# of Pubs', 0))
+
+    def write_geojson(self, filename, points):
+        '''Write bins as a GeoJSON FeatureCollection of points
+        Args:
+            filename (string) -- output file
+            points (list) -- bins from aggregate
+        '''
+        features = []
+        for point in points:
+            properties = dict((k, v) for k, v in point.iteritems() if k not in ('lon', 'lat'))
+            features.append({'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [point['lon'], point['lat']]}, 'properties': properties})
+
+        with open(filename, 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'features': features}, f, separators = (',', ':'))
+
+    def write_csv(self, filename, points):
+        '''Write bins as csv, with the columns of the input
+        Args:
+            filename (string) -- output file
+            points (list) -- bins from aggregate
+        '''
+        with open(filename, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow([self.name_field, 'organizations'] + self.metrics + [self.lon_field, self.lat_field])
+
+            for point in points:
+                writer.writerow([point[self.name_field], point['organizations']] + [point[m] for m in self.metrics] + [point['lon'], point['lat']])
+
+    def build(self, output, zooms, cell = 64):
+        '''Write every zoom level
+        Args:
+            output (string) -- output directory
+            zooms (list) -- zoom levels (int)
+            cell (int) -- bin size in pixels
+        '''
+        if(not os.path.isdir(output)):
+            os.makedirs(output)
+
+        for zoom in zooms:
+            points = self.aggregate(zoom, cell)
+            print 'Zoom ' + str(zoom) + ': ' + str(len(self.orgs)) + ' organizations in ' + str(len(points)) + ' bins'
+
+            self.write_geojson(os.path.join(output, 'zoom-{}.geojson'.format(zoom)), points)
+            self.write_csv(os.path.join(output, 'zoom-{}.csv'.format(zoom)), points)
+
+        with open(os.path.join(output, 'index.json'), 'w') as f:
+            json.dump({'zooms': zooms, 'metrics': self.metrics}, f)
+
+def number(value):
+    '''Parse a csv number
+    Args:
+        value (string) -- cell
+    Returns:
+        (float) -- value, None if the cell is not a number
+    '''
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def mercator(lon, lat):
+    '''Project a location to Web Mercator, both axes from 0 to 1
+    Args:
+        lon (float) -- longitude
+        lat (float) -- latitude
+    Returns:
+        (tuple) -- x, y
+    '''
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = (lon + 180) / 360.0
+    y = (1 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2
+    return x, y
+
+if(__name__ == '__main__'):
+    arguments = docopt(__doc__)
+    zooms = [int(z) for z in arguments['--zooms'].split(',')]
+    TileBuilder(arguments['--input']).build(arguments['--output'], zooms, int(arguments['--cell']))
+    print 'Complete.'
@@ -0,0 +1,167 @@
+import json, os
+
+class OrgMatcher:
+    '''Match organization names against institution names
+
+    Institution names are normalized once and kept in an inverted index of
+    their words, so each organization is only compared with the institutions
+    sharing a significant (not ignored) word with it.
+    '''
+    replace  = {',': '', ' of ': ' ', ' at ': ' ', '-': ' ', 'Main Campus': '', ' and ': ' ', ' in ': ' ', '.': '', ' the ': ' ', 'The ': '', ' for ': ' ', ' & ': '', '&': ''}
+
+    # longest first, so ' & ' is replaced before '&'
+    replacements = sorted(replace.items(), key = lambda r: -len(r[0]))
+
+    ignore = set(['state', 'university', 'school', 'medicine', 'science', 'technology', 'college', 'medical', 'institute', 'research', 'health', 'system', 'office', 'national', 'sciences', 'center', 'campus', 'city'])
+
+    # words naming a campus of an institution, not another institution
+    campus = set(['campus'])
+
+    def __init__(self, rows, key = 'INSTNM'):
+        '''
+        Args:
+            rows (list) -- institutions (dict)
+            key (string) -- institution name column
+        '''
+        self.rows = rows
+        self.key = key
+        self.names = {}
+        self.ids = {}
+        self.word_sets = {}
+        self.words = []
+        self.index = {}
+
+        for i, row in enumerate(rows):
+            self.names.setdefault(row[key], i)
+            self.ids[row.get('UNITID')] = i
+
+            words = self.tokenize(row[key])
+            self.word_sets.setdefault(frozenset(words), i)
+            self.words.append(set(words))
+
+            for word in set(words):
+                self.index.setdefault(word, []).append(i)
+
+    @classmethod
+    def tokenize(cls, name):
+        '''Split a name into lowercase words, disregarding punctuation and filler words
+        Args:
+            name (string) -- organization name
+        Returns:
+            (list) -- words
+        '''
+        for k, v in cls.replacements:
+            name = name.replace(k, v)
+
+        return name.lower().strip().split()
+
+    @classmethod
+    def normalize(cls, name):
+        '''Get the normalized form of a name, used as decision key
+        Args:
+            name (string) -- organization name
+        Returns:
+            (string) -- lowercase words separated by single spaces
+        '''
+        return ' '.join(cls.tokenize(name))
+
+    def get(self, unitid):
+        '''Get an institution by id
+        Args:
+            unitid (string) -- IPEDS UNITID
+        Returns:
+            (dict) -- institution, None if there is none
+        '''
+        i = self.ids.get(unitid)
+        return self.rows[i] if i is not None else None
+
+    def exact(self, org):
+        '''Find an institution with the same name, or the same words in any order
+        Args:
+            org (string) -- organization name
+        Returns:
+            (dict) -- matching institution, None if there is none
+        '''
+        i = self.names.get(org)
+
+        if(i is None):
+            i = self.word_sets.get(frozenset(self.tokenize(org)))
+
+        return self.rows[i] if i is not None else None
+
+    def candidates(self, org):
+        '''Find institutions sharing at least two words, one of them not ignored
+        Args:
+            org (string) -- organization name
+        Returns:
+            (list) -- (score, institution) best first; score is the share of
+                distinct significant words in common
+        '''
+        words = self.tokenize(org)
+        org_set = set(words)
+        significant = org_set - self.ignore
+
+        found = set()
+        for word in significant:
+            found.update(self.index.get(word, []))
+
+        scored = []
+        for i in found:
+            if(sum(1 for word in words if word in self.words[i]) >= 2):
+                inst_significant = self.words[i] - self.ignore
+                score = float(len(significant & inst_significant)) / len(significant | inst_significant)
+                scored.append((score, self.rows[i]))
+
+        return sorted(scored, key = lambda s: (-s[0], s[1][self.key]))
+
+    def resolve(self, org, candidates, min_score = .8):
+        '''Pick a candidate without asking, only when it is unambiguous
+        Args:
+            org (string) -- organization name
+            candidates (list) -- (score, institution) best first, from candidates
+            min_score (float) -- lowest accepted score
+        Returns:
+            (dict) -- the only candidate scoring at least min_score, if it has the
+                same words as the organization apart from campus words, None otherwise
+        '''
+        accepted = [match for score, match in candidates if score >= min_score]
+
+        if(len(accepted) != 1):
+            return None
+
+        # ignored words still tell institutions apart (Indiana University, Indiana State University)
+        if(set(self.tokenize(org)) - self.campus != set(self.tokenize(accepted[0][self.key])) - self.campus):
+            return None
+
+        return accepted[0]
+
+class DecisionCache:
+    '''Accepted matches of earlier runs, stored as JSON
+
+    Maps normalized organization names to the UNITID of the chosen
+    institution, or null when no institution matches.
+    '''
+    def __init__(self, filename):
+        '''
+        Args:
+            filename (string) -- JSON file, created on save
+        '''
+        self.filename = filename
+        self.decisions = {}
+
+        if(os.path.isfile(filename)):
+            with open(filename) as f:
+                self.decisions = json.load(f)
+
+    def __contains__(self, org):
+        return OrgMatcher.normalize(org) in self.decisions
+
+    def get(self, org):
+        return self.decisions.get(OrgMatcher.normalize(org))
+
+    def set(self, org, unitid):
+        self.decisions[OrgMatcher.normalize(org)] = unitid
+
+    def save(self):
+        with open(self.filename, 'w') as f:
+            json.dump(self.decisions, f, indent = 2, sort_keys = True)
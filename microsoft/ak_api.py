@@ -2,36 +2,79 @@
 
 Usage:
   ak_api.py monthly [--start=<start> --end=<end> --month=<month> --resume]
-  ak_api.py evaluate <year> [--count=<count> --start=<start>]
-  ak_api.py range <start> <end>
-  ak_api.py extended <year> [--count=<count> --start=<start> --offset=<offset>]
+  ak_api.py evaluate <year> [--count=<count> --start=<start> --resume]
+  ak_api.py range <start> <end> [--resume]
+  ak_api.py extended <year> [--count=<count> --start=<start> --offset=<offset> --resume]
   ak_api.py january <year> [--count=<count>]
-  ak_api.py match <filename> [--count=<count>, --start=<start>]
+  ak_api.py match <filename> [--count=<count>, --start=<start> --size=<size> --processes=<processes>]
   ak_api.py journals
   ak_api.py xsede
   ak_api.py bridges
   ak_api.py fields [--count=<count> --start=<start>]
   ak_api.py citations <filename>
+  ak_api.py migrate
+  ak_api.py snapshot <path>
+  ak_api.py graph <path> [--start=<start> --end=<end>]
+  ak_api.py metrics <by> <filename> [--snapshot=<path> --year=<year> --recent=<recent>]
+  ak_api.py refresh [--org=<filename> --fos=<filename>]
+  ak_api.py charts <filename> [--snapshot=<path>]
 
 Options:
   year:     year to retrieve publications for
   count:    number of entities to retrieve per call
+  size:     number of candidates to compare per title
+  processes: number of processes verifying matches
   start:    month/year to begin on
   end:      month/year to end on
+  resume:   continue from the last written page instead of starting over
+  by:       grouping for metrics: org, fos, journal or year
+  recent:   number of years counted as recent
 '''
 
 import time, json, re, calendar, string, os.path, ConfigParser, sys
-import requests, pymongo, numpy, mlpy
+import requests, pymongo, numpy
 from docopt import docopt
 from doc_parse import DocParser
+from client import Client
+from pager import Pager, RateLimiter
+from writer import Writer, content_hash
+from checkpoint import Checkpoints
+from retry import RetryPolicy, CircuitBreaker, retry_after
+from hierarchy import FieldHierarchy
+from matcher import TitleMatcher
+from titles import MSString, normalize_title
+from lookup import read_rows, find_in
+from snapshot import Snapshot
+from graph import CitationGraph
+from metrics import Groups, groupings, write_csv
+import charts
 
 class AK_API:
     db_name = 'microsoft'
     call_limit = 1000
+    api_url = 'https://westus.api.cognitive.microsoft.com/academic/v1.0/'
+    elastic_url = 'http://localhost:9200/microsoft/publications/'
+    # extended metadata fields stored parsed (EP): names, venue, volume, issue, pages, DOI
+    extended_fields = ['DN', 'VFN', 'VSN', 'BV', 'V', 'I', 'FP', 'LP', 'DOI']
+    attributes = 'Id,Ti,L,Y,D,Pt,CC,ECC,AA.AuN,AA.AuId,AA.AfN,AA.AfId,AA.S,F.FId,F.FN,J.JId,J.JN,C.CId,C.CN,RId'
     
     def __init__(self):
-        self.mongo_connect()
+        self.workers = int(self.get_config_option('api', 'workers', 4))
+        self.limiter = RateLimiter(self.get_config_option('api', 'rate', 0))
+        self.http = Client(pool_size = self.workers)
+        self.retry = RetryPolicy(max_retries = self.get_config_option('api', 'retries', 10))
+        self.breaker = CircuitBreaker()
+        self._db = None
         DocParser(__doc__).parse_doc(self)
+        
+    @property
+    def db(self):
+        '''MongoDB database, connected on first use so snapshot analyses run without a server
+        '''
+        if(self._db is None):
+            self.mongo_connect()
+            
+        return self._db
     
     def mongo_connect(self):
         '''Connect to MongoDB
@@ -42,25 +85,42 @@ class AK_API:
         print 'Connecting to MongoDB on port {port} ...'.format(**opts)
         
         self.client = pymongo.MongoClient(**opts)
-        self.db = self.client[self.db_name]
+        self._db = self.client[self.db_name]
         
-        collection_names = self.db.collection_names()
+        collection_names = self._db.collection_names()
         
         # create indexes
         if('publications' not in collection_names):
             self.db.publications.create_index('Id', unique = True)
+            self.db.publications.create_index('Ti_norm')
+            self.db.publications.create_index('J.JId')
             
         if('extended' not in collection_names):
             self.db.extended.create_index('Id', unique = True)
+            self.create_extended_indexes()
             
         if('fields' not in collection_names):
             self.db.fields.create_index('Id', unique = True)
             
         if('journals' not in collection_names):
             self.db.journals.create_index('JId', unique = True)
+            self.db.journals.create_index('volumes.issues.ids')
             
         if('xsede' not in collection_names):
             self.db.xsede.create_index('Id', unique = True)
+            
+        if('checkpoints' not in collection_names):
+            self.db.checkpoints.create_index([('kind', 1), ('year', 1), ('month', 1), ('letter', 1)], unique = True)
+            
+        if('changes' not in collection_names):
+            self.db.changes.create_index([('c', 1), ('Id', 1)], unique = True)
+            self.db.changes.create_index('t')
+
+    def create_extended_indexes(self):
+        '''Index the parsed extended metadata fields
+        '''
+        self.db.extended.create_index([('EP.V', 1), ('EP.I', 1)])
+        self.db.extended.create_index('EP.DOI')
 
     def get_credentials(self):
         '''Get API key
@@ -76,11 +136,12 @@ class AK_API:
             
         return key
         
-    def get_config_option(self, section, option):
+    def get_config_option(self, section, option, default = None):
         '''Get configuration item
         Args:
             section (str): config section
             option (str): item in section
+            default: value used when the item is not set
         Return:
             str: config item
         '''
@@ -88,91 +149,115 @@ class AK_API:
         if(os.path.isfile('ak_api.cfg')):
             config = ConfigParser.SafeConfigParser()
             config.readfp(open('ak_api.cfg'))
+            
+            if(default is not None and not config.has_option(section, option)):
+                return default
+                
             option = config.get(section, option)
             return option
         else:
             print 'Unable to locate configuration file.'
-            return None
+            return default
         
-    def evaluate(self, year, count = 100000, start = 0, offset = 0):
+    def evaluate(self, year, count = 100000, start = 0, offset = 0, resume = False):
         '''Perform GET request to API "evaluate" command
         Args:
             year (str) -- year to update
             count (int) -- results per call
             start (int) -- month to start on (0 being January)
+            resume (bool) -- continue from checkpoints
         '''
-        count = int(count)
-        key = self.get_credentials()
-        attributes = 'Id,Ti,L,Y,D,CC,ECC,AA.AuN,AA.AuId,AA.AfN,AA.AfId,AA.S,F.FId,F.FN,J.JId,J.JN,C.CId,C.CN,RId'
+        windows = self.get_windows(year, start)
+        self.retrieve_pubs(windows, count, self.attributes, self.add_pubs, offset = offset, resume = resume)
         
-        if(start == 0):
-            self.january(year, count, attributes)
-            start = 1
+    def get_windows(self, year, start = 0):
+        '''Build date windows for a year, January is split by title letter
+        Args:
+            year (str) -- year
+            start (int) -- month to start on (0 being January)
+        Returns:
+            (list) -- windows, dicts with year, month, letter, expr and label
+        '''
+        windows = []
         
+        if(int(start) == 0):
+            windows.extend(self.get_january_windows(year))
+            start = 1
+            
         for m in xrange(int(start), 12):
             date = {}
             date['year'] = year
             date['month'] = str(m + 1) if m > 8 else '0' + str(m + 1)
             date['day'] = calendar.monthrange(int(year), m + 1)[1]
-            print "Getting results for {year}-{month} ...".format(**date)
-            expr = "D=['{year}-{month}-01','{year}-{month}-{day}']".format(**date)         
-            self.retrieve_pubs(year, count, offset, key, attributes, self.add_pubs, expr = expr)
-            offset = 0
             
-    def range(self, start, end, count = 100000, month = 0):
+            window = {'year': int(year), 'month': m + 1, 'letter': None}
+            window['expr'] = "D=['{year}-{month}-01','{year}-{month}-{day}']".format(**date)
+            window['label'] = "{year}-{month}".format(**date)
+            windows.append(window)
+            
+        return windows
+        
+    def get_january_windows(self, year):
+        '''Build January windows for a year, one per title letter
+        Args:
+            year (str) -- year
+        Returns:
+            (list) -- windows
+        '''
+        windows = []
+        
+        for l in string.lowercase:
+            window = {'year': int(year), 'month': 1, 'letter': l}
+            window['expr'] = "And(Ti='{letter}'...,D=['{year}-01-01','{year}-01-31'])".format(letter = l, year = year)
+            window['label'] = "January {year} starting with {letter}".format(letter = l, year = year)
+            windows.append(window)
+            
+        return windows
+            
+    def range(self, start, end, count = 100000, month = 0, resume = False):
         '''Wrapper for evaluate, by year
         Args:
             start (int) -- year to start
             end (int) -- year to end
             count (int) -- results per call
             month (int) -- month to start on (0 being January)
+            resume (bool) -- continue from checkpoints
         '''
         years = range(int(start), int(end) + 1)
         
-        self.evaluate(years[0], count = count, start = month)
+        # one set of windows for the whole range, so year boundaries do not stall the workers
+        windows = self.get_windows(years[0], month)
         
         for year in years[1:]:
-            self.evaluate(year, count = count)
+            windows.extend(self.get_windows(year))
+            
+        self.retrieve_pubs(windows, count, self.attributes, self.add_pubs, resume = resume)
             
-    def monthly(self, start = 2005, end = 2017, resume = False):
+    def monthly(self, start = 2005, end = 2017, month = 0, resume = False):
+        '''Retrieve a range of years, progress is checkpointed for --resume
+        Args:
+            start (int) -- year to start
+            end (int) -- year to end
+            month (int) -- month to start on (0 being January)
+            resume (bool) -- continue from checkpoints
+        '''
         try:
-            if(not resume):
-                self.range(start, end)
+            self.range(start, end, month = month, resume = resume)
         except APIError as err:
             print
-            print "Error. Saving log file ak_api.log ..."
-            
-            with open('ak_api.log', 'a+') as f:
-                f.write('time: ' + time.strftime('%a %H:%M:%S') + '\n')
-                f.write('error: ' + err.msg + '\n')
-                f.write('resume: ' + str(err.month) + ',' + str(err.year) + '\n')
-                f.write('\n')
-            
-            print "Complete."
+            print "Error: {} ({}-{})".format(err.msg, err.year, err.month)
+            print "Completed pages are checkpointed, run again with --resume to continue."
         
-    def extended(self, year, count = 999, start = 0, offset = 0):
+    def extended(self, year, count = 999, start = 0, offset = 0, resume = False):
         '''Get extended metadata
         Args:
             year (str) -- year to update
             count (int) -- results per call
             start (int) -- month to start on (0 being January)
+            resume (bool) -- continue from checkpoints
         '''
-        count = int(count)
-        key = self.get_credentials()
-        
-        if(start == 0):
-            self.january(year, count, 'E')
-            start = 1
-        
-        for m in xrange(int(start), 12):
-            date = {}
-            date['year'] = year
-            date['month'] = str(m + 1) if m > 8 else '0' + str(m + 1)
-            date['day'] = calendar.monthrange(int(year), m + 1)[1]
-            expr = "D=['{year}-{month}-01','{year}-{month}-{day}']".format(**date)
-            print "Getting results for {year}-{month} ...".format(**date)            
-            self.retrieve_pubs(year, count, offset, key, 'E', self.add_extended, expr = expr)
-            offset = 0
+        windows = self.get_windows(year, start)
+        self.retrieve_pubs(windows, count, 'E', self.add_extended, offset = offset, resume = resume)
             
     def january(self, year, count = 100000, attributes = '', offset = 0):
         '''Get publications for January of given year, by title
@@ -180,369 +265,618 @@ class AK_API:
             year (str) -- year to retrieve
             count (int) -- number of results per call
         '''
-        count = int(count)
-        key = self.get_credentials()
-        attributes = attributes if attributes else 'Id,Ti,L,Y,D,CC,ECC,AA.AuN,AA.AuId,AA.AfN,AA.AfId,AA.S,F.FId,F.FN,J.JId,J.JN,C.CId,C.CN,RId'
+        attributes = attributes if attributes else self.attributes
+        hook = self.add_extended if attributes == 'E' else self.add_pubs
         
-        for l in string.lowercase:
-            print "Retrieve January publications for {year} starting with {letter} ...".format(letter = l, year = year)
-            expr = "And(Ti='{letter}'...,D=['{year}-01-01','{year}-01-31'])".format(letter = l, year = year)
-            self.retrieve_pubs(year, count, offset, key, attributes, self.add_pubs, expr = expr)
-            offset = 0
+        windows = self.get_january_windows(year)
+        self.retrieve_pubs(windows, count, attributes, hook, offset = offset)
         
     def bridges(self):
         '''Get bridges publications
         '''
         print "Matching Bridges publications ..."
 
-        matches = []
-        with open('bridges.txt') as f:
-            for row in f.readlines():
-                bid, title = row.strip().split('|')
-                
-                pub = self.db.publications.find_one({'Ti': self.convert_title(title)})
-                if(pub):
-                    matches.append(bid + '|' + str(pub['Id']) + '|' + str(pub['CC']) + '\n')
-                    
         with open('bridges_ms.txt', 'w+') as f:
-            f.writelines(matches)
+            for rows in read_rows('bridges.txt'):
+                norms = [normalize_title(title, 'utf-8', 'ISO-8859-1') for bid, title in rows]
+                pubs = find_in(self.db.publications, 'Ti_norm', norms, {'Id': 1, 'CC': 1, 'Ti_norm': 1, '_id': 0})
+                
+                for (bid, title), norm in zip(rows, norms):
+                    pub = pubs.get(norm)
+                    if(pub):
+                        f.write(bid + '|' + str(pub['Id']) + '|' + str(pub['CC']) + '\n')
         
         print "Complete."
         
-    def retrieve_pubs(self, year, count, offset, key, attributes, hook, expr = ''):
-        '''Get publications from via API
+    def retrieve_pubs(self, windows, count, attributes, hook, offset = 0, resume = False):
+        '''Get publications via API, several windows at a time
         Args:
-            year (str) -- year
+            windows (list) -- windows to retrieve, see get_windows
+            count (int) -- results per call
             attributes (str) -- paper entity attributes to retrieve
-            start (int) -- month to start on
-            callback (function) -- function to handle results 
+            hook (function) -- function to handle results
+            offset (int) -- offset to start the first window on
+            resume (bool) -- continue from checkpoints instead of clearing them
         '''
-        offset = int(offset)
         count = int(count)
         count = count if count <= self.call_limit else self.call_limit
+        key = self.get_credentials()
+        
+        def fetch(window, offset):
+            return self.fetch_page(window, count, offset, key, attributes)
+        
+        checkpoints = Checkpoints(self.db.checkpoints, 'extended' if attributes == 'E' else 'publications')
+        tasks = checkpoints.tasks(windows, offset = offset, resume = resume)
+        
+        self.writer = Writer(self.db)
+        self.writer.start()
+        
+        try:
+            Pager(fetch, hook, commit = checkpoints.commit, workers = self.workers).run(tasks, count)
+        finally:
+            self.writer.close()
+            print self.http.summary()
+            print self.writer.summary()
+        
+    def fetch_page(self, window, count, offset, key, attributes):
+        '''Get a single page of results
+        Args:
+            window (dict) -- window to retrieve
+            count (int) -- results per call
+            offset (int) -- offset within the window
+            key (str) -- API key
+            attributes (str) -- paper entity attributes to retrieve
+        Returns:
+            (list) -- entities
+        '''
+        if(offset == 0):
+            print "Getting results for {} ...".format(window['label'])
         
         data = {}
-        data['expr'] = expr
+        data['expr'] = window['expr']
         data['attributes'] = attributes
         data['count'] = count
-        retries = 0
-        max_retries = 100
-        wait_time = 30
+        data['offset'] = offset
+        
+        headers = {
+            'Ocp-Apim-Subscription-Key': key,
+        }
+        
+        # throttling is handled by the circuit breaker and not counted against the retries
+        attempt = 0
+        throttled = 0
     
         while(True):
-            if(retries >= max_retries):
-                raise APIError(year, offset, msg = 'Retry limit exceeded')
-                
-            data['offset'] = offset
-            
-            # add parameters to url
-            url = 'https://westus.api.cognitive.microsoft.com/academic/v1.0/evaluate?'
-            for k, v in data.iteritems():
-                url += k + '=' + str(v) + '&'
-            
-            headers = {
-                'Ocp-Apim-Subscription-Key': key,
-            }       
+            if(attempt > self.retry.max_retries):
+                raise APIError(window['year'], window['month'], msg = 'Retry limit exceeded')
             
             #print "Getting items from {} to {} ...".format(offset + 1, offset + count)
             
+            self.breaker.wait()
+            self.limiter.wait()
+            
             try:
-                r = requests.get(url, headers = headers)              
-            except requests.exceptions.ChunkedEncodingError:
-                print "Connection reset. Trying again ..."
+                r = self.http.get(self.api_url + 'evaluate', params = data, headers = headers, timeout = 120)
+            except requests.exceptions.RequestException as err:
+                print "Connection error ({}). Retrying ...".format(type(err).__name__)
+                attempt = self.backoff(attempt)
+                continue
+            
+            # throttled, pause every worker for as long as the service asks
+            if(r.status_code == 429 or (r.status_code == 503 and 'Retry-After' in r.headers)):
+                wait = retry_after(r)
+                print "Throttled ({}). Retrying ...".format(r.status_code)
+                self.breaker.failure(wait if wait is not None else self.retry.delay(throttled))
+                throttled += 1
                 continue
             
+            # a bad key or exhausted quota will not succeed on retry
+            if(r.status_code in (401, 403)):
+                raise APIError(window['year'], window['month'], msg = 'Not authorized (HTTP {})'.format(r.status_code))
+            
             try:
                 result = r.json()
-            except:
+            except ValueError:
                 print "Error. Did not receive JSON. Retrying ..."
-                retries += 1
-                time.sleep(wait_time)
+                attempt = self.backoff(attempt)
                 continue
 
-            if('error' in result):
-                print "Server error. Retrying ..."
-                retries += 1
-                print result['error']
-                time.sleep(wait_time)
-                continue
-                
-            if(r.status_code == 500):
-                print "Server error. Retrying ..."
-                retries += 1
-                time.sleep(wait_time)
+            if(r.status_code != 200 or not isinstance(result, dict) or 'error' in result or 'entities' not in result):
+                print "Unexpected response (HTTP {}). Retrying ...".format(r.status_code)
+                print r.text[:200]
+                attempt = self.backoff(attempt)
                 continue
             
-            entities = [e for e in result['entities'] if e]
+            self.breaker.success()
             
-            #print "{} results retrieved".format(len(entities))
-            
-            if(len(entities) == 0):
-                print "0 found. Retrying ..."
-                time.sleep(wait_time)
-                retries += 1
-                continue
+            # an empty page is a real result, it ends the window
+            return [e for e in result['entities'] if e]
             
-            if(len(entities)):
-                hook(entities)
-                offset += count
-                
-                if(len(entities) < count):
-                    break
-            else:
-                break
+    def backoff(self, attempt):
+        '''Record a transient failure and wait before retrying
+        Args:
+            attempt (int) -- number of failed attempts so far
+        Returns:
+            (int) -- number of failed attempts, including this one
+        '''
+        self.breaker.failure()
+        time.sleep(self.retry.delay(attempt))
+        return attempt + 1
         
-    def add_pubs(self, pubs):
+    def add_pubs(self, pubs, callback = None):
         '''Add publication data to MongoDB
         Args:
             pubs (dict) -- of publications, from json
+            callback (function) -- called once the publications are written
         '''
         #print 'Saving current result in MongoDB ...'
         
-        bulk = self.db.publications.initialize_unordered_bulk_op()
-        
         for pub in pubs:
-            bulk.find({'Id': pub['Id']}).upsert().replace_one(pub)
-        try:
-            bulk.execute()
-        except pymongo.errors.BulkWriteError as bwe:
-            print bwe.details
+            if('Ti' in pub):
+                pub['Ti_norm'] = normalize_title(pub['Ti'])
+        
+        self.writer.put('publications', pubs, callback)
             
-    def add_extended(self, pubs):
+    def add_extended(self, pubs, callback = None):
         '''Add extended metadata to MongoDB
         Args:
             pubs (dict) -- of publications, from json
+            callback (function) -- called once the metadata is written
         '''
         print 'Saving current result in MongoDB ...'
         
-        bulk = self.db.extended.initialize_unordered_bulk_op()
-        
         for pub in pubs:
-            bulk.find({'Id': pub['Id']}).upsert().replace_one(pub)
-        try:
-            bulk.execute()
-        except pymongo.errors.BulkWriteError as bwe:
-            print bwe.details
+            pub['EP'] = parse_extended(pub.get('E'))
+        
+        self.writer.put('extended', pubs, callback)
+        
+    def migrate(self):
+        '''Add derived fields to records retrieved before they existed
+        '''
+        self.migrate_extended()
+        self.migrate_titles()
+        
+        print "Creating journal index ..."
+        self.db.publications.create_index('J.JId')
+        
+    def migrate_extended(self):
+        '''Add parsed extended metadata (EP) to existing extended records
+        '''
+        print "Creating extended indexes ..."
+        self.create_extended_indexes()
+        
+        records = self.db.extended.find({'EP': {'$exists': False}}).batch_size(1000)
+        total = records.count()
+        
+        print "Parsing extended metadata for {} records ...".format(total)
+        ops = []
+        for i, record in enumerate(records):
+            record['EP'] = parse_extended(record.get('E'))
+            update = {'EP': record['EP'], '_h': content_hash(record)}
+            ops.append(pymongo.UpdateOne({'_id': record['_id']}, {'$set': update}))
+            
+            if(len(ops) >= 10000):
+                self.db.extended.bulk_write(ops, ordered = False)
+                ops = []
+                sys.stdout.write("\r{}/{}".format(i + 1, total))
+                sys.stdout.flush()
+                
+        if(ops):
+            self.db.extended.bulk_write(ops, ordered = False)
+            
+        print
+        print "Complete."
+        
+    def migrate_titles(self):
+        '''Add normalized titles (Ti_norm) to existing publications
+        '''
+        print "Creating title index ..."
+        self.db.publications.create_index('Ti_norm')
+        
+        records = self.db.publications.find({'Ti_norm': {'$exists': False}, 'Ti': {'$exists': True}}, {'Ti': 1}).batch_size(10000)
+        total = records.count()
+        
+        print "Normalizing {} titles ...".format(total)
+        ops = []
+        for i, record in enumerate(records):
+            ops.append(pymongo.UpdateOne({'_id': record['_id']}, {'$set': {'Ti_norm': normalize_title(record['Ti'])}}))
+            
+            if(len(ops) >= 10000):
+                self.db.publications.bulk_write(ops, ordered = False)
+                ops = []
+                sys.stdout.write("\r{}/{}".format(i + 1, total))
+                sys.stdout.flush()
+                
+        if(ops):
+            self.db.publications.bulk_write(ops, ordered = False)
+            
+        print
+        print "Complete."
+        
+    def snapshot(self, path):
+        '''Export a columnar snapshot of publications
+        Args:
+            path (str) -- snapshot directory
+        '''
+        print "Exporting publications to {} ...".format(path)
+        snapshot = Snapshot.export(self.db.publications, path, xsede = self.db.xsede)
+        print "{} publications exported.".format(len(snapshot))
+        
+    def xsede_ids(self, snapshot = None):
+        '''Get the Ids of XSEDE publications
+        Args:
+            snapshot (Snapshot) -- loaded snapshot, read instead of the xsede collection
+        Returns:
+            (list) -- publication Ids
+        '''
+        if(snapshot is not None):
+            return snapshot.xsede()
+            
+        return [x['Id'] for x in self.db.xsede.find({}, {'Id': 1, '_id': 0})]
+        
+    def graph(self, path, start = None, end = None):
+        '''Compute citation graph measures for XSEDE publications from a snapshot
+        Args:
+            path (str) -- snapshot directory
+            start (int) -- first year of citing publications counted in CCw
+            end (int) -- last year of citing publications counted in CCw
+        '''
+        print "Building citation graph ..."
+        snapshot = Snapshot(path).load()
+        graph = CitationGraph(snapshot)
+        
+        ids = self.xsede_ids(snapshot)
+        pos = graph.index(ids)
+        
+        group = numpy.zeros(graph.size, dtype = bool)
+        group[pos[pos >= 0]] = True
+        
+        print "Computing citations, two-hop impact and co-citations ..."
+        window = graph.citations(start, end)
+        two_hop = graph.two_hop()
+        co_citations = graph.co_citations(group)
+        
+        ops = []
+        for xid, i in zip(ids, pos):
+            if(i >= 0):
+                update = {'CCw': int(window[i]), 'H2': int(two_hop[i]), 'COC': int(co_citations[i])}
+                ops.append(pymongo.UpdateOne({'Id': xid}, {'$set': update}))
+        
+        print "Updating {} of {} XSEDE publications ...".format(len(ops), len(ids))
+        if(ops):
+            self.db.xsede.bulk_write(ops, ordered = False)
+            
+        print "Complete."
         
-    def fields(self, count = 100000, start = 0):
-        '''Add field of study parents
+    def metrics(self, by, filename, snapshot = None, year = None, recent = 5):
+        '''Compute h, g, i10 and m indices of XSEDE publications per group
+        Args:
+            by (str) -- grouping: org, fos, journal or year
+            filename (str) -- output csv
+            snapshot (str) -- snapshot directory, read instead of the publications collection
+            year (int) -- current year, defaults to the latest publication year
+            recent (int) -- number of years counted as recent
+        '''
+        if(by not in groupings):
+            print "Unknown grouping {}, use one of: {}".format(by, ', '.join(sorted(groupings)))
+            return
+            
+        snapshot = Snapshot(snapshot).load() if snapshot else None
+        ids = self.xsede_ids(snapshot)
+        
+        print "Grouping {} publications by {} ...".format(len(ids), by)
+        if(snapshot is not None):
+            groups = Groups.from_snapshot(snapshot, by, ids)
+        else:
+            projection = {'_id': 0, 'Id': 1, 'CC': 1, 'Y': 1, groupings[by][1]: 1}
+            groups = Groups.from_documents(find_in(self.db.publications, 'Id', ids, projection).itervalues(), by)
+            
+        if(year is None):
+            year = groups.years.max() if len(groups.years) else 0
+        year = int(year)
+        recent = int(recent)
+        
+        print "Computing indices for {} groups ...".format(len(groups.names))
+        table = groups.indices(year, recent)
+        
+        # data-fos.csv starts with the indices of all publications
+        totals = groups.totals().indices(year, recent) if(by == 'fos') else None
+        
+        print "Writing {} ...".format(filename)
+        write_csv(filename, groupings[by][2], groups, table, totals)
+        
+        print "Complete."
+        
+    def fields(self, count = 0, start = 0):
+        '''Add the top-level (L0) field name to each publication's field entries
+        Args:
+            count (int) -- number of publications to process, 0 for all
+            start (int) -- index (in Id order) of the first publication to process
         Warning:
             Microsoft has duplicate entries for any given field name, field names from FieldsOfStudy.txt do not match current field names retrieved from API
         '''
+        count = int(count)
+        start = int(start)
+        
         print 'Getting parent fields ...'
         
         with open('FieldsOfStudy.txt') as f:
             fields = {}
             for row in f.readlines():
                 fid, fname = row.split('\t')
-                # replace em dash with minus
-                fname = re.sub('\xe2\x80\x93', '-', fname)
-                fields[fid] = fname.strip().lower()
+                fields[fid] = field_name(fname)
             
             # reverse fields dict
             ids = dict(zip(fields.values(), fields.keys()))
 
-        # cache tree
-        with open('FieldOfStudyHierarchy.txt') as f:
-            children = {}
-            for row in f.readlines():
-                ci, cl, pi, pl, p = row.split()
-                
-                if(pl == 'L0' and pi not in children):
-                    children[pi] = {'parents': [], 'level': 'L0'}
-                
-                child = children.get(ci)
-                if(child):
-                    child['parents'].append({'id': pi, 'prob': float(p)})
-                else:
-                    children[ci] = {'parents': [{'id': pi, 'prob': float(p)}], 'level': cl}
+        # best top-level parent of each field, resolved once and cached in FieldOfStudyTop.txt
+        hierarchy = FieldHierarchy().load()
+        parents = dict((fid, fields.get(top)) for fid, (top, prob) in hierarchy.tops.iteritems())
+        
+        # sorted by Id, so --start/--count select disjoint shards for separate processes
+        records = self.db.publications.find({'F': {'$exists': True}}, {'Id': 1, 'F': 1, '_id': 0}).sort('Id', 1).skip(start)
+        if(count):
+            records = records.limit(count)
+        records = records.batch_size(10000)
+        
+        total = records.count(with_limit_and_skip = True)
+        updated = 0
+        ops = []
+        
+        for i, record in enumerate(records):
+            changed = False
+            for field in record['F']:
+                top = parents.get(ids.get(field_name(field.get('FN', ''))))
                 
-        # build branches
-        for child, branch in children.iteritems(): 
-            for parent in branch['parents']:
-                if(parent['id'] in children):
-                    parent['pointer'] = children[parent['id']]
+                if(top and field.get('L0') != top):
+                    field['L0'] = top
+                    changed = True
                     
-            # remove parents with no pointer
-            branch['parents'] = [p for p in branch['parents'] if 'pointer' in p]
-        
-        # get probabilities            
-        def get_prob(parent, probs = []):
-            '''recursive function for tree traversal through fields of study hierarchy
-            '''
-            for parent in parent['pointer']['parents']:
-                new_prob = parent['prob'] * probs[-1][1] if probs else float(parent['prob'])
-                probs.append((parent['id'], new_prob))
-                get_prob(parent, probs)
-                
-            return probs
-            
-        parents = {}
-        for child, branch in children.iteritems():
-            # check if the "child" is a top-level parent
-            if(children[child]['level'] == 'L0'):
-                top = (child,)
-            else:
-                probs = []
-                for parent in branch['parents']:
-                    probs.extend(get_prob(parent, [(parent['id'], parent['prob'])]))
+            if(changed):
+                ops.append(pymongo.UpdateOne({'Id': record['Id']}, {'$set': {'F': record['F']}}))
                 
-                # determine best probability
-                top = (None, 0)
-                for prob in probs:
-                    pid, probability = prob
-                    if(children[pid]['level'] == 'L0' and probability > top[1]):
-                        top = prob
-            
-            parents[child] = fields.get(top[0])
-        
-        records = self.db.publications.find()
-        total = records.count()
-        fos = []
+            if(len(ops) >= 10000):
+                self.db.publications.bulk_write(ops, ordered = False)
+                updated += len(ops)
+                ops = []
+                sys.stdout.write("\r{}/{}".format(i + 1, total))
+                sys.stdout.flush()
         
-        for i, record in enumerate(records):
-            sys.stdout.write("\r{}/{}".format(i, total))
-            sys.stdout.flush()
+        if(ops):
+            self.db.publications.bulk_write(ops, ordered = False)
+            updated += len(ops)
             
-            if('F' in record):
-                for field in record['F']:
-                    fid = field['FId']
-                    field_name = field['FN']                   
-                    old_field_id = ids.get(field_name)
-        
-        self.db.fos.insert_many(fos)    
+        print
+        print '{} publications updated.'.format(updated)
         print 'Complete.'
         
     def journals(self):
+        '''Aggregate citation counts by journal volume and issue
+        '''
         print "Getting records ..."
-        records = self.db.publications.find({}, {'Id': 1, 'CC': 1, 'J': 1})
+        # both cursors are sorted by Id (unique index), so they can be merge-joined in one pass
+        records = self.db.publications.find({'J': {'$exists': True}}, {'Id': 1, 'CC': 1, 'J.JId': 1, '_id': 0}).sort('Id', 1).batch_size(10000)
+        extended = self.db.extended.find({'EP.V': {'$exists': True}, 'EP.I': {'$exists': True}}, {'Id': 1, 'EP.V': 1, 'EP.I': 1, '_id': 0}).sort('Id', 1).batch_size(10000)
     
         print "Analyzing journals ..."
         journals = {}
         counter = 0
         count = records.count()
-        for record in records:
+        for record, ext in merge_join(records, extended):
             counter += 1
-            sys.stdout.write('\r' + str(counter) + '/' + str(count))
-            sys.stdout.flush()
+            if(counter % 10000 == 0):
+                sys.stdout.write('\r' + str(counter) + '/' + str(count))
+                sys.stdout.flush()
             
-            if('J' in record):
-                pid = record['Id']
-                
-                extended = self.db.extended.find_one({'Id': pid})
-                
-                if(extended and 'E' in extended):
-                    extended_parsed = json.loads(extended['E'])
-                    
-                    if('I' in extended_parsed and 'V' in extended_parsed):
-                        jid = record['J']['JId']
-                        volume = extended_parsed['V']
-                        issue = extended_parsed['I']
-                        
-                        cc = record['CC']
-                        
-                        if(jid in journals):
-                            journal = journals[jid]
-                            
-                            if(volume in journal['volumes']):
-                                if(issue in journal['volumes'][volume]['issues']):
-                                    journal['volumes'][volume]['issues'][issue]['citations'].append(cc)
-                                else:
-                                    journal['volumes'][volume]['issues'][issue] = {'citations': [cc]}
-                            else:
-                                journal['volumes'][volume] = {'issues': {issue: {'citations': [cc]}}}
-                        else:
-                            journals[jid] = {'JId': jid, 'volumes': {volume: {'issues': {issue: {'citations': [cc]}}}}}
+            issues = journals.setdefault(record['J']['JId'], {})
+            issues.setdefault((ext['EP']['V'], ext['EP']['I']), []).append((record['Id'], record['CC']))
                         
         print
-        print "Converting journals to MongoDB-friendly format..."
-        
-        insert = []                
-        for journal in journals.values():
-            volumes = []
-            for vid, volume in journal['volumes'].items():
-                issues = []
-                for iid, issue in volume['issues'].items():
-                    issue.update({'issue': iid})
-                    issues.append(issue)
-                
-                volume['issues'] = issues
-                volume.update({'volume': vid})
-                volumes.append(volume)
+        print "Inserting journals into database ..."
+        self.save_journals(journals)
+        self.db.journals.create_index('volumes.issues.ids')
+        
+    def charts(self, filename, snapshot = None):
+        '''Write the report chart series (publication types, publications by year) of XSEDE publications
+        Args:
+            filename (str) -- output JSON file
+            snapshot (str) -- snapshot directory, read instead of the publications collection
+        '''
+        snapshot = Snapshot(snapshot).load() if snapshot else None
+        ids = self.xsede_ids(snapshot)
+        
+        print "Counting {} publications by type and year ...".format(len(ids))
+        if(snapshot is not None):
+            counts = charts.from_snapshot(snapshot, ids)
+        else:
+            counts = charts.from_collection(self.db.publications, ids)
+            
+        print "Writing {} ...".format(filename)
+        charts.write(filename, charts.payload(*counts))
+        
+        print "Complete."
+        
+    def refresh(self, org = None, fos = None):
+        '''Recompute journals, PACC and metrics for publications changed since the last refresh
+        Args:
+            org (str) -- organization metrics csv to rewrite
+            fos (str) -- field of study metrics csv to rewrite
+        '''
+        start = time.time()
+        changed = set(c['Id'] for c in self.db.changes.find({'t': {'$lte': start}}, {'Id': 1, '_id': 0}))
+        
+        if(not changed):
+            print "No changes."
+            return
+            
+        print "{} publications changed ...".format(len(changed))
+        pubs = find_in(self.db.publications, 'Id', changed, {'Id': 1, 'J.JId': 1, '_id': 0})
+        
+        # issues of the changed publications before the crawl, they may have moved to another journal
+        previous = self.previous_issues(changed)
+        jids = list(set(pub['J']['JId'] for pub in pubs.itervalues() if 'J' in pub) | set(key[0] for key in previous))
+        
+        print "Recomputing {} journals ...".format(len(jids))
+        records = []
+        for i in xrange(0, len(jids), 5000):
+            query = {'J.JId': {'$in': jids[i:i + 5000]}}
+            records.extend(self.db.publications.find(query, {'Id': 1, 'CC': 1, 'J.JId': 1, '_id': 0}))
+            
+        extended = find_in(self.db.extended, 'Id', [r['Id'] for r in records], {'Id': 1, 'EP.V': 1, 'EP.I': 1, '_id': 0})
+        
+        # journals are rebuilt whole, so publications that moved between issues or journals are handled too
+        journals = dict((jid, {}) for jid in jids)
+        issues = {}
+        for record in records:
+            ext = extended.get(record['Id'], {}).get('EP', {})
+            
+            if(ext.get('V') and ext.get('I')):
+                key = (ext['V'], ext['I'])
+                journals[record['J']['JId']].setdefault(key, []).append((record['Id'], record['CC']))
+                issues[record['Id']] = (record['J']['JId'],) + key
                 
-            journal['volumes'] = volumes
-            insert.append(journal)
+        self.save_journals(journals)
         
-        print "Inserting journals into database ..."                    
-        self.db.journals.insert_many(journals.values(), ordered = False)
+        # peer averages change for every publication sharing an issue with a changed one, before or after the crawl
+        touched = set(issues[xid] for xid in changed if xid in issues)
+        affected = changed | set(xid for xid, key in issues.iteritems() if key in touched)
+        for ids in previous.itervalues():
+            affected.update(ids)
+        xsede = set(x['Id'] for x in self.db.xsede.find({}, {'Id': 1, '_id': 0})) & affected
         
-    def citations(self, filename):
-        citations = []
-        with open(filename) as f:       
-            for row in f.readlines():
-                if('|' not in row):
-                    continue
-                    
-                pid, mid = row.strip().split('|', 1)
-                pub = self.db.publications.find_one({'Id': int(mid)})
-                if(pub and 'CC' in pub):
-                    citations.append(pid + '|' + str(pub['CC']) + '\n')
+        if(xsede):
+            self.update_xsede(xsede)
+            
+            for by, filename in [('org', org), ('fos', fos)]:
+                if(filename):
+                    self.metrics(by, filename)
+        
+        self.db.changes.delete_many({'t': {'$lte': start}})
         
+        print "Complete."
+        
+    def previous_issues(self, ids):
+        '''Get the stored journal issues holding any of the given publications
+        Args:
+            ids (iterable) -- publication ids
+        Returns:
+            (dict) -- (JId, volume, issue): [publication ids]
+        '''
+        wanted = set(ids)
+        ids = list(wanted)
+        
+        issues = {}
+        for i in xrange(0, len(ids), 5000):
+            for journal in self.db.journals.find({'volumes.issues.ids': {'$in': ids[i:i + 5000]}}, {'_id': 0}):
+                for key, members in journal_ids(journal).iteritems():
+                    if(wanted.intersection(members)):
+                        issues[(journal['JId'],) + key] = members
+                        
+        return issues
+        
+    def save_journals(self, journals):
+        '''Replace journal documents
+        Args:
+            journals (dict) -- JId: {(volume, issue): [(publication id, citation count)]}
+        '''
+        ops = [pymongo.ReplaceOne({'JId': jid}, journal_document(jid, issues), upsert = True) for jid, issues in journals.iteritems()]
+        
+        for i in xrange(0, len(ops), 10000):
+            self.db.journals.bulk_write(ops[i:i + 10000], ordered = False)
+        
+    def citations(self, filename):
+        '''Get citation counts for matched publications
+        Args:
+            filename (str) -- rows of "id|microsoft id"
+        '''
         new_file = '{0}_citations.{1}'.format(*filename.split('.'))
         print "Saving file {}".format(new_file)
         with open(new_file, 'w+') as f:
-            f.writelines(citations)       
+            for rows in read_rows(filename):
+                pubs = find_in(self.db.publications, 'Id', [int(mid) for pid, mid in rows], {'Id': 1, 'CC': 1, '_id': 0})
+                
+                for pid, mid in rows:
+                    pub = pubs.get(int(mid))
+                    if(pub and 'CC' in pub):
+                        f.write(pid + '|' + str(pub['CC']) + '\n')
         
     def xsede(self):    
         print "Gathering XD publications ..."
         ids = set()
-        with open('pubs_xup_ms.txt') as f:
-            for row in f.readlines():
-                ids.add(int(row.strip().split('|')[1]))
+        for filename in ['pubs_xup_ms.txt', 'pubs_report_ms.txt']:
+            for rows in read_rows(filename):
+                ids.update(int(mid) for xid, mid in rows)
+        
+        self.update_xsede(ids)
+        
+        print "Complete."
+        
+    def update_xsede(self, ids):
+        '''Store citation and peer citation information of XSEDE publications
+        Args:
+            ids (iterable) -- Microsoft ids of the publications
+        '''
+        ids = set(ids)
+        
+        print "Getting {} publications ...".format(len(ids))
+        pubs = find_in(self.db.publications, 'Id', ids, {'Id': 1, 'CC': 1, 'J.JId': 1, '_id': 0})
+        
+        extended = find_in(self.db.extended, 'Id', ids, {'Id': 1, 'EP.V': 1, 'EP.I': 1, '_id': 0})
+        extended = dict((xid, e.get('EP', {})) for xid, e in extended.iteritems())
+        
+        # (JId, volume, issue) of each publication that has one
+        keys = {}
+        for xid, pub in pubs.iteritems():
+            ext = extended.get(xid, {})
             
-        with open('pubs_report_ms.txt') as f:
-            for row in f.readlines():
-                ids.add(int(row.strip().split('|')[1]))
+            if('J' in pub and ext.get('V') and ext.get('I')):
+                keys[xid] = (pub['J']['JId'], ext['V'], ext['I'])
+                
+        print "Loading journal issues ..."
+        jids = list(set(k[0] for k in keys.values()))
+        issues = {}
+        for journal in find_in(self.db.journals, 'JId', jids).itervalues():
+            for (volume, issue), citations in journal_issues(journal).iteritems():
+                issues[(journal['JId'], volume, issue)] = (sum(citations), len(citations))
+                    
+        print "Computing peer average citations ..."
+        pacc_ids = [xid for xid, key in keys.iteritems() if key in issues]
+        totals = numpy.array([issues[keys[xid]] for xid in pacc_ids], dtype = float).reshape(-1, 2)
+        cc = numpy.array([pubs[xid]['CC'] for xid in pacc_ids], dtype = float)
+        
+        # leave-one-out mean of the issue, excluding the publication itself
+        peers = totals[:, 1] - 1
+        pacc = (totals[:, 0] - cc) / numpy.maximum(peers, 1)
+        pacc = dict((xid, float(p)) for xid, p, n in zip(pacc_ids, pacc, peers) if n > 0)
         
+        # update in place, keeping fields added by other commands (graph)
         xsede = []
-        total = len(ids)
-        for i, xid in enumerate(ids):
-            sys.stdout.write("\r{}/{}".format(i + 1, total))
-            sys.stdout.flush()
-
-            pub = self.db.publications.find_one({'Id': xid})
-            extended = self.db.extended.find_one({'Id': xid})
-            
-            xd = {}
-            xd['Id'] = pub['Id']
-            xd['CC'] = pub['CC']
+        for xid, pub in pubs.iteritems():
+            update = {'$set': {'Id': pub['Id'], 'CC': pub['CC']}}
             
-            if(extended and 'E' in extended):
-                ext = json.loads(extended['E'])
-                pub_volume = ext.get('V')
-                pub_issue = ext.get('I')
-            
-                if('J' in pub and pub_volume and pub_issue):
-                    journal = self.db.journals.find_one({'Id': pub['J']['JId']})
-                    
-                    ref_volume = next((v for v in journal['volumes'] if v['volume'] == pub_volume), None)
-                    ref_issue = next((i for i in ref_volume['issues'] if i['issue'] == pub_issue), None)
-                    citations = ref_issue['citations']
-                    citations.remove(xd['CC'])
-                    
-                    xd['PACC'] = numpy.mean(citations)
-            xsede.append(xd)
+            if(xid in pacc):
+                update['$set']['PACC'] = pacc[xid]
+            else:
+                update['$unset'] = {'PACC': ''}
+                
+            xsede.append(pymongo.UpdateOne({'Id': xid}, update, upsert = True))
         
-        print
-        print "Inserting into Mongo ..." 
-        try:          
-            self.db.xsede.insert_many(xsede, ordered = False)
-        except pymongo.errors.BulkWriteError:
-            print "Ignoring duplicate entries."
+        if(len(pubs) < len(ids)):
+            print "{} publications not found.".format(len(ids) - len(pubs))
         
-        print "Complete."
+        print "Inserting into Mongo ..." 
+        if(xsede):
+            self.db.xsede.bulk_write(xsede, ordered = False)
         
-    def match(self, filename, count = 100, start = 0):
+    def match(self, filename, count = 100, start = 0, size = 5, processes = None):
+        '''Match titles against Microsoft publications
+        Args:
+            filename (str) -- rows of "id|title"
+            count (int) -- titles per ElasticSearch request
+            start (int) -- batch to start on
+            size (int) -- candidates compared per title
+            processes (int) -- verification processes, defaults to the number of cores
+        '''
         count = int(count)
         start = int(start)
         
@@ -558,101 +892,139 @@ class AK_API:
         pubs_iter = map(None, *(iter(pubs),) * count)
         pubs_iter = pubs_iter[start:]
         current = start
+        matcher = TitleMatcher(self.http, self.elastic_url, size = size, processes = processes)
+        new_file = '{0}_ms.{1}'.format(*filename.split('.'))
         
         for cur_pubs in pubs_iter:
             print "Getting matches {} - {}".format(current * count + 1, current * count + count)
-            elastic_matches = []
-            for pub in [p for p in cur_pubs if p]:
-                pid, title = pub
-                
-                ti = MSString(title, decode = 'ISO-8859-1', encode = 'utf-8')
-
-                data = {}
-                data['size'] = 1                
-                data['query'] = {}
-                data['query']['match'] = {'Ti': ti.to_string()}
-                
-                r = requests.get('http://localhost:9200/microsoft/publications/_search', data = json.dumps(data))
-                
-                top = next(iter(r.json()['hits']['hits'] or []), None)
-
-                if(top):
-                    top['title'] = ti.to_string()
-                    top['id'] = pid
-                    elastic_matches.append(top)
+            cur_pubs = [p for p in cur_pubs if p]
+            
+            # exact matches are indexed point queries, only the rest go to ElasticSearch
+            norms = [normalize_title(title, 'utf-8', 'ISO-8859-1') for pid, title in cur_pubs]
+            exact = self.db.publications.find({'Ti_norm': {'$in': [n for n in norms if n]}}, {'Id': 1, 'Ti_norm': 1, '_id': 0})
+            exact = dict((p['Ti_norm'], p['Id']) for p in exact)
+            
+            matches = [pid + '|' + str(exact[norm]) + '\n' for (pid, _), norm in zip(cur_pubs, norms) if norm in exact]
+            cur_pubs = [pub for pub, norm in zip(cur_pubs, norms) if norm not in exact]
+            exact_count = len(matches)
+            
+            titles = [MSString(title, decode = 'ISO-8859-1', encode = 'utf-8').to_string() for pid, title in cur_pubs]
+            candidates = matcher.candidates(titles)
                 
             print "Filtering matches ..."
-            min_lcs = .9
-            sub_boost = .2
-            matches = []
-            for match in elastic_matches:
+            for (pid, _), (hit, result) in zip(cur_pubs, matcher.rank(titles, candidates)):
                 #TODO: remove duplicates
-                matched = False
-                xd_title = MSString(match['title']).convert()
-                ms_title = MSString(match['_source']['Ti'], encode = 'utf-8').convert()
-                
-                lcs_len, _ = self.string_lcs(xd_title, ms_title)
-                shorter = min(xd_title, ms_title, key = len)
-                longer = max(xd_title, ms_title, key = len)
-                shorter_rate = float(lcs_len) / len(shorter)
-                longer_rate = float(lcs_len) / len(longer)
-                
-                # give bost to substrings
-                boost = sub_boost if shorter_rate == 1.0 else 0
-                
-                # exact match
-                if(xd_title == ms_title):
-                    matched = True
-                # lcs (proportionally) greater than minimum lcs
-                elif(longer_rate + boost >= min_lcs):
-                    matched = True
-                else:            
-                    print xd_title
-                    print ms_title
-                    print lcs_len
-                    print longer_rate
+                if(hit):
+                    matches.append(pid + '|' + str(hit['_source']['Id']) + '\n')
+                elif(result):
+                    print result['title']
+                    print result['candidate']
+                    print result['lcs']
+                    print result['rate']
                     print
-                    
-                if(matched):
-                    matches.append(match['id'] + '|' + str(match['_source']['Id']) + '\n')
              
-            print "{} / {} matches found.".format(len(matches), count)
+            print "{} / {} matches found ({} exact).".format(len(matches), len(cur_pubs) + exact_count, exact_count)
             mode = 'a' if current > 0 else 'w+'
-            print filename.split('.')
-            new_file = '{0}_ms.{1}'.format(*filename.split('.'))
             print "Updating file {}...".format(new_file)
             with open(new_file, mode) as f:
                 f.writelines(matches)
                 
             current += 1
 
+        matcher.close()
+        print matcher.summary()
+        print self.http.summary()
         print "Complete."
         
-    def string_lcs(self, x, y):
-        int_x = [ord(l) for l in x]
-        int_y = [ord(l) for l in y]
-        return mlpy.lcs_std(int_x, int_y)        
-        
-class MSString:
-    def __init__(self, ms_string, encode = '', decode = ''):
-        ms_string = ms_string.decode(decode) if decode else ms_string
-        ms_string = ms_string.encode(encode) if encode else ms_string
-        
-        ms_string = ms_string.replace('-', ' ')
-        ms_string = ms_string.replace('/', ' ')
-        ms_string = ms_string.replace('+', ' ')
-        ms_string = str(ms_string).translate(None, string.punctuation)
-        self.ms_string = ms_string.lower()
-        
-    def convert(self):
-        # remove whitespace
-        self.ms_string = self.ms_string.translate(None, string.whitespace)
-        # remove non-printable characters
-        self.ms_string = ''.join(s for s in self.ms_string if s in string.printable)
-        return self.ms_string
-        
-    def to_string(self):
-        return self.ms_string
+def field_name(name):
+    '''Normalize a field of study name for comparison
+    Args:
+        name (str|unicode) -- field name
+    Returns:
+        (str) -- lowercase utf-8 name, em dashes replaced with minus
+    '''
+    name = name.encode('utf-8') if isinstance(name, unicode) else name
+    # replace em dash with minus
+    name = re.sub('\xe2\x80\x93', '-', name)
+    return name.strip().lower()
+    
+def parse_extended(extended):
+    '''Parse commonly used fields from the extended metadata string
+    Args:
+        extended (str) -- API "E" attribute, a JSON string
+    Returns:
+        (dict) -- fields present out of AK_API.extended_fields
+    '''
+    try:
+        parsed = json.loads(extended) if extended else {}
+    except ValueError:
+        return {}
+        
+    return dict((k, parsed[k]) for k in AK_API.extended_fields if parsed.get(k) not in (None, ''))
+    
+def journal_document(jid, issues):
+    '''Convert a journal's issues to its MongoDB document
+    Args:
+        jid (int) -- journal id
+        issues (dict) -- (volume, issue): [(publication id, citation count)]
+    Returns:
+        (dict) -- {JId, volumes: [{volume, issues: [{issue, citations, ids}]}]}
+    '''
+    volumes = {}
+    for (volume, issue), pubs in issues.iteritems():
+        volumes.setdefault(volume, []).append({'issue': issue, 'citations': [cc for xid, cc in pubs], 'ids': [xid for xid, cc in pubs]})
+        
+    return {'JId': jid, 'volumes': [{'volume': volume, 'issues': v} for volume, v in volumes.iteritems()]}
+    
+def journal_issues(journal):
+    '''Convert a journal document back to its issues
+    Args:
+        journal (dict) -- MongoDB journal document
+    Returns:
+        (dict) -- (volume, issue): [citation counts]
+    '''
+    issues = {}
+    for volume in journal['volumes']:
+        for issue in volume['issues']:
+            issues[(volume['volume'], issue['issue'])] = issue['citations']
+            
+    return issues
+    
+def journal_ids(journal):
+    '''Get the publications of a journal document's issues
+    Args:
+        journal (dict) -- MongoDB journal document
+    Returns:
+        (dict) -- (volume, issue): [publication ids], empty for documents written without ids
+    '''
+    issues = {}
+    for volume in journal['volumes']:
+        for issue in volume['issues']:
+            issues[(volume['volume'], issue['issue'])] = issue.get('ids', [])
+            
+    return issues
+    
+def merge_join(left, right, key = 'Id'):
+    '''Join two iterables of documents sorted by key
+    Args:
+        left (iterable) -- documents sorted by key, unique keys
+        right (iterable) -- documents sorted by key, unique keys
+        key (str) -- join field
+    Returns:
+        (generator) -- (left, right) pairs with equal keys
+    '''
+    right = iter(right)
+    other = next(right, None)
+    
+    for doc in left:
+        while(other is not None and other[key] < doc[key]):
+            other = next(right, None)
+            
+        if(other is None):
+            break
+            
+        if(other[key] == doc[key]):
+            yield doc, other
         
 class APIError(Exception):
     def __init__(self, year, month, msg = "API Error"):
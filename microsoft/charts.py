@@ -0,0 +1,91 @@
+'''Chart series for the report: publication types and publications by year
+'''
+
+import json
+import numpy
+
+# publication type (Pt) names, by code
+types = ['None', 'Journal Paper', 'Patent', 'Conference Paper', 'Book Chapter', 'Book', 'Book Reference Entry', 'Dataset', 'Repository']
+
+def type_codes(pt, journal, conference):
+    '''Get publication type codes, guessing from the venue when Pt is unknown
+    Args:
+        pt (ndarray) -- Pt of each publication, -1 or 0 when unknown
+        journal (ndarray) -- whether each publication has a journal (J)
+        conference (ndarray) -- whether each publication has a conference (C)
+    Returns:
+        (ndarray) -- index into types
+    '''
+    pt = numpy.asarray(pt)
+    known = (pt > 0) & (pt < len(types))
+    guess = numpy.where(journal, 1, numpy.where(conference, 3, 0))
+    return numpy.where(known, pt, guess).astype('int64')
+
+def from_snapshot(snapshot, ids):
+    '''Count publications by year and type from a snapshot
+    Args:
+        snapshot (Snapshot) -- loaded publications snapshot
+        ids (iterable) -- publication ids
+    Returns:
+        (tuple) -- years, type codes and counts, one per (year, type)
+    '''
+    selected = numpy.in1d(snapshot['Id'], numpy.asarray(list(ids), dtype = 'int64'))
+    pt = snapshot['Pt'][selected] if 'Pt' in snapshot.meta['columns'] else numpy.zeros(selected.sum(), dtype = 'int64')
+    codes = type_codes(pt, snapshot['JId'][selected] != -1, snapshot['CId'][selected] != -1)
+    years = numpy.asarray(snapshot['Y'][selected])
+    return years, codes, numpy.ones(len(codes), dtype = 'int64')
+
+def from_collection(collection, ids, chunk_size = 5000):
+    '''Count publications by year and type with aggregation queries
+    Args:
+        collection (Collection) -- publications collection
+        ids (iterable) -- publication ids
+        chunk_size (int) -- ids per query
+    Returns:
+        (tuple) -- years, type codes and counts, one per (year, type)
+    '''
+    ids = list(set(ids))
+    present = lambda field: {'$ne': [{'$ifNull': [field, None]}, None]}
+    group = {'Y': '$Y', 'Pt': '$Pt', 'J': present('$J'), 'C': present('$C')}
+
+    counts = {}
+    for i in xrange(0, len(ids), chunk_size):
+        pipeline = [{'$match': {'Id': {'$in': ids[i:i + chunk_size]}}}, {'$group': {'_id': group, 'n': {'$sum': 1}}}]
+
+        for row in collection.aggregate(pipeline):
+            # missing fields are grouped as null
+            key = (row['_id'].get('Y') or -1, row['_id'].get('Pt') or -1, row['_id']['J'], row['_id']['C'])
+            counts[key] = counts.get(key, 0) + row['n']
+
+    keys = counts.keys()
+    rows = numpy.array(keys, dtype = 'int64').reshape(-1, 4)
+    codes = type_codes(rows[:, 1], rows[:, 2] > 0, rows[:, 3] > 0)
+    return rows[:, 0], codes, numpy.array([counts[k] for k in keys], dtype = 'int64')
+
+def payload(years, codes, counts):
+    '''Build the report chart series
+    Args:
+        years (ndarray) -- year of each count, -1 when unknown
+        codes (ndarray) -- type code of each count
+        counts (ndarray) -- number of publications
+    Returns:
+        (dict) -- {types: [{name, y}], years: {categories, data}}
+    '''
+    by_type = numpy.bincount(codes, weights = counts, minlength = len(types))
+    order = numpy.argsort(-by_type, kind = 'mergesort')
+    chart_types = [{'name': types[i], 'y': int(by_type[i])} for i in order if by_type[i]]
+
+    known = years > 0
+    categories, index = numpy.unique(years[known], return_inverse = True)
+    by_year = numpy.bincount(index, weights = counts[known], minlength = len(categories))
+
+    return {'types': chart_types, 'years': {'categories': [str(y) for y in categories], 'data': [int(n) for n in by_year]}}
+
+def write(filename, data):
+    '''Write a compact JSON payload
+    Args:
+        filename (str) -- output file
+        data (dict) -- payload
+    '''
+    with open(filename, 'w') as f:
+        json.dump(data, f, separators = (',', ':'))
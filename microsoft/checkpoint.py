@@ -0,0 +1,76 @@
+'''Resumable crawl state stored in MongoDB
+'''
+
+import datetime
+
+class Checkpoints:
+    '''Progress of each retrieval window
+
+    One document per (kind, year, month, letter) window, holding the next offset
+    to fetch and whether the window is complete. A window is only advanced once
+    its page has been written, so a resumed run neither repeats API calls nor
+    upserts for committed pages.
+    '''
+    def __init__(self, collection, kind):
+        '''
+        Args:
+            collection (Collection) -- MongoDB collection to store checkpoints in
+            kind (str) -- name of the crawl, e.g. "publications" or "extended"
+        '''
+        self.collection = collection
+        self.kind = kind
+
+    def key(self, window):
+        '''Get window key
+        Args:
+            window (dict) -- window
+        Returns:
+            (dict) -- query for the window's checkpoint
+        '''
+        return {'kind': self.kind, 'year': window['year'], 'month': window['month'], 'letter': window['letter']}
+
+    def tasks(self, windows, offset = 0, resume = False):
+        '''Get (window, offset) tasks for windows that still have pages to fetch
+        Args:
+            windows (list) -- windows to retrieve
+            offset (int) -- offset to start the first window on, when not resuming
+            resume (bool) -- continue from stored checkpoints instead of clearing them
+        Returns:
+            (list) -- of (window, offset) tuples
+        '''
+        if(not resume):
+            self.clear(windows)
+            return [(w, int(offset) if i == 0 else 0) for i, w in enumerate(windows)]
+
+        stored = {}
+        for doc in self.collection.find({'$or': [self.key(w) for w in windows]}):
+            stored[(doc['year'], doc['month'], doc['letter'])] = doc
+
+        tasks = []
+        for window in windows:
+            doc = stored.get((window['year'], window['month'], window['letter']))
+
+            if(doc is None):
+                tasks.append((window, 0))
+            elif(not doc['complete']):
+                tasks.append((window, doc['offset']))
+
+        print "Resuming {} of {} windows ...".format(len(tasks), len(windows))
+        return tasks
+
+    def commit(self, window, offset, complete):
+        '''Record a written page
+        Args:
+            window (dict) -- window
+            offset (int) -- next offset to fetch
+            complete (bool) -- whether the window has no more pages
+        '''
+        update = {'offset': offset, 'complete': complete, 'time': datetime.datetime.utcnow()}
+        self.collection.update_one(self.key(window), {'$set': update}, upsert = True)
+
+    def clear(self, windows):
+        '''Remove checkpoints for windows
+        Args:
+            windows (list) -- windows
+        '''
+        self.collection.delete_many({'$or': [self.key(w) for w in windows]})
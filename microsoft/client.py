@@ -0,0 +1,97 @@
+'''Shared HTTP client for the Microsoft Knowledge API and ElasticSearch
+'''
+
+import time, threading
+import requests
+
+class Client:
+    '''Pooled keep-alive session that requests compressed responses
+
+    Every request records its latency, decoded size and transferred size (the
+    compressed size when the server honors Accept-Encoding).
+    '''
+    def __init__(self, pool_size = 10, headers = None):
+        '''
+        Args:
+            pool_size (int) -- connections kept open per host
+            headers (dict) -- headers sent with every request
+        '''
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections = int(pool_size), pool_maxsize = int(pool_size))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+
+        if(headers):
+            self.session.headers.update(headers)
+
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''Clear request statistics
+        '''
+        with self.lock:
+            self.requests = 0
+            self.seconds = 0.0
+            self.bytes = 0
+            self.transferred = 0
+
+    def get(self, url, params = None, **kwargs):
+        '''Perform GET request
+        Args:
+            url (str) -- url without query string
+            params (dict) -- query parameters, url encoded by requests
+            kwargs -- passed on to requests
+        Returns:
+            (Response) -- with latency (seconds) and transferred (bytes) attributes
+        '''
+        return self.request('GET', url, params = params, **kwargs)
+
+    def post(self, url, data = None, **kwargs):
+        '''Perform POST request
+        Args:
+            url (str) -- url
+            data (str) -- request body
+            kwargs -- passed on to requests
+        Returns:
+            (Response) -- with latency (seconds) and transferred (bytes) attributes
+        '''
+        return self.request('POST', url, data = data, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        '''Perform request and record its statistics
+        Args:
+            method (str) -- HTTP method
+            url (str) -- url
+            kwargs -- passed on to requests
+        Returns:
+            (Response) -- with latency (seconds) and transferred (bytes) attributes
+        '''
+        start = time.time()
+        r = self.session.request(method, url, **kwargs)
+        size = len(r.content)
+        r.latency = time.time() - start
+
+        try:
+            r.transferred = int(r.headers.get('Content-Length', size))
+        except ValueError:
+            r.transferred = size
+
+        with self.lock:
+            self.requests += 1
+            self.seconds += r.latency
+            self.bytes += size
+            self.transferred += r.transferred
+
+        return r
+
+    def summary(self):
+        '''Get request statistics
+        Returns:
+            (str) -- number of requests, mean latency and data received
+        '''
+        with self.lock:
+            latency = self.seconds / self.requests if self.requests else 0
+            return '{} requests, {:.3f}s mean latency, {:.1f} MB received ({:.1f} MB transferred)'.format(
+                self.requests, latency, self.bytes / 1e6, self.transferred / 1e6)
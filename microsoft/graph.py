@@ -0,0 +1,100 @@
+'''Citation graph over publication references (RId)
+'''
+
+import numpy
+
+class CitationGraph:
+    '''CSR citation graph, built from a snapshot
+
+    Publications are numbered by their position in the snapshot (Id order).
+    The references of publication i are dst[offsets[i]:offsets[i + 1]]; src
+    holds the citing publication of every edge. References to publications
+    outside the snapshot are dropped. All measures are computed with bincount
+    reductions over the edges.
+    '''
+    def __init__(self, snapshot):
+        '''
+        Args:
+            snapshot (Snapshot) -- loaded publications snapshot
+        '''
+        self.ids = numpy.asarray(snapshot['Id'])
+        self.years = numpy.asarray(snapshot['Y'])
+        offsets, refs = snapshot.csr('RId')
+        offsets = numpy.asarray(offsets)
+        refs = numpy.asarray(refs)
+
+        # citing publication of every reference
+        src = numpy.repeat(numpy.arange(len(self.ids)), numpy.diff(offsets))
+
+        # map referenced Ids to positions, ids are sorted
+        dst = numpy.searchsorted(self.ids, refs)
+        dst[dst == len(self.ids)] = 0
+        known = self.ids[dst] == refs if len(self.ids) else numpy.zeros(len(refs), dtype = bool)
+
+        self.src = src[known]
+        self.dst = dst[known]
+        self.size = len(self.ids)
+        self.offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(self.src, minlength = self.size))))
+
+    def references(self, i):
+        '''Get referenced publications
+        Args:
+            i (int) -- publication position
+        Returns:
+            (ndarray) -- positions of the referenced publications
+        '''
+        return self.dst[self.offsets[i]:self.offsets[i + 1]]
+
+    def index(self, ids):
+        '''Get positions of publication ids
+        Args:
+            ids (iterable) -- publication ids
+        Returns:
+            (ndarray) -- positions, -1 for ids not in the graph
+        '''
+        ids = numpy.asarray(list(ids), dtype = 'int64')
+        pos = numpy.searchsorted(self.ids, ids)
+        pos[pos == self.size] = 0
+        return numpy.where(self.ids[pos] == ids, pos, -1) if self.size else -numpy.ones(len(ids), dtype = 'int64')
+
+    def citations(self, start = None, end = None):
+        '''Count citations received, optionally only from publications of some years
+        Args:
+            start (int) -- first year of citing publications
+            end (int) -- last year of citing publications
+        Returns:
+            (ndarray) -- citation count of each publication
+        '''
+        mask = numpy.ones(len(self.src), dtype = bool)
+        years = self.years[self.src]
+
+        if(start is not None):
+            mask &= years >= int(start)
+        if(end is not None):
+            mask &= years <= int(end)
+
+        return numpy.bincount(self.dst[mask], minlength = self.size)
+
+    def two_hop(self, citations = None):
+        '''Count second generation citations, the citations received by each citing publication
+        Args:
+            citations (ndarray) -- citation counts to propagate, defaults to all citations
+        Returns:
+            (ndarray) -- two-hop impact of each publication
+        '''
+        if(citations is None):
+            citations = self.citations()
+
+        return numpy.bincount(self.dst, weights = citations[self.src], minlength = self.size).astype('int64')
+
+    def co_citations(self, group):
+        '''Count co-citations with publications outside a group
+        Every publication citing a group member contributes the number of
+        non-members it also references.
+        Args:
+            group (ndarray) -- boolean mask of group members
+        Returns:
+            (ndarray) -- for each publication, non-members co-cited with it
+        '''
+        outside = numpy.bincount(self.src, weights = ~group[self.dst], minlength = self.size)
+        return numpy.bincount(self.dst, weights = outside[self.src], minlength = self.size).astype('int64')
@@ -0,0 +1,110 @@
+'''Field of study hierarchy resolver
+'''
+
+import os.path
+
+class FieldHierarchy:
+    '''Best top-level (L0) ancestor of every field of study
+
+    The probability of a path is the product of its edge probabilities. The best
+    L0 ancestor of each field is found with one memoized max-product pass over
+    the hierarchy (a DAG), and saved as a tab separated lookup table
+    (field, top-level field, probability) that later runs load directly.
+    '''
+    def __init__(self, hierarchy_file = 'FieldOfStudyHierarchy.txt', table_file = 'FieldOfStudyTop.txt'):
+        '''
+        Args:
+            hierarchy_file (str) -- rows of "child, child level, parent, parent level, probability"
+            table_file (str) -- resolved lookup table, rebuilt when older than hierarchy_file
+        '''
+        self.hierarchy_file = hierarchy_file
+        self.table_file = table_file
+        self.tops = {}
+
+    def load(self):
+        '''Load the lookup table, resolving the hierarchy if needed
+        Returns:
+            (FieldHierarchy) -- self
+        '''
+        if(os.path.isfile(self.table_file) and (not os.path.isfile(self.hierarchy_file) or
+                os.path.getmtime(self.table_file) >= os.path.getmtime(self.hierarchy_file))):
+            with open(self.table_file) as f:
+                for row in f:
+                    fid, top, prob = row.split('\t')
+                    self.tops[fid] = (top, float(prob))
+        else:
+            print 'Resolving field of study hierarchy ...'
+            self.resolve()
+            self.save()
+
+        return self
+
+    def resolve(self):
+        '''Compute the best L0 ancestor of every field
+        '''
+        parents = {}
+        levels = {}
+        with open(self.hierarchy_file) as f:
+            for row in f:
+                if(not row.strip()):
+                    continue
+
+                ci, cl, pi, pl, p = row.split()
+                levels[ci] = cl
+                levels[pi] = pl
+                parents.setdefault(ci, []).append((pi, float(p)))
+
+        best = {}
+        for fid in levels:
+            if(fid in best):
+                continue
+
+            # iterative post-order walk, so deep hierarchies do not hit the recursion limit
+            stack = [fid]
+            visiting = set()
+            while(stack):
+                node = stack[-1]
+
+                if(node in best):
+                    stack.pop()
+                    continue
+
+                if(levels.get(node) == 'L0'):
+                    best[node] = (node, 1.0)
+                    stack.pop()
+                    continue
+
+                pending = [pi for pi, p in parents.get(node, []) if pi not in best and pi not in visiting]
+                if(pending and node not in visiting):
+                    visiting.add(node)
+                    stack.extend(pending)
+                    continue
+
+                top = None
+                for pi, p in parents.get(node, []):
+                    ancestor = best.get(pi)
+                    if(ancestor and (top is None or p * ancestor[1] > top[1])):
+                        top = (ancestor[0], p * ancestor[1])
+
+                best[node] = top
+                visiting.discard(node)
+                stack.pop()
+
+        self.tops = dict((k, v) for k, v in best.iteritems() if v)
+
+    def save(self):
+        '''Write the lookup table
+        '''
+        with open(self.table_file, 'w') as f:
+            for fid, (top, prob) in sorted(self.tops.iteritems()):
+                f.write('{}\t{}\t{!r}\n'.format(fid, top, prob))
+
+    def top(self, fid):
+        '''Get best top-level ancestor
+        Args:
+            fid (str) -- field id
+        Returns:
+            (str) -- L0 field id, None if the field has no L0 ancestor
+        '''
+        top = self.tops.get(fid)
+        return top[0] if top else None
@@ -0,0 +1,45 @@
+'''Bulk lookups for pipe delimited input files
+'''
+
+def read_rows(filename, chunk_size = 5000):
+    '''Stream rows of a pipe delimited file in chunks
+    Args:
+        filename (str) -- file with rows of "key|value"
+        chunk_size (int) -- rows per chunk
+    Returns:
+        (generator) -- lists of [key, value] rows, rows without "|" are skipped
+    '''
+    chunk = []
+    with open(filename) as f:
+        for row in f:
+            if('|' not in row):
+                continue
+
+            chunk.append(row.strip().split('|', 1))
+
+            if(len(chunk) >= chunk_size):
+                yield chunk
+                chunk = []
+
+    if(chunk):
+        yield chunk
+
+def find_in(collection, field, values, projection = None, chunk_size = 5000):
+    '''Resolve many values with batched $in queries
+    Args:
+        collection (Collection) -- MongoDB collection
+        field (str) -- indexed field to match
+        values (iterable) -- values to look up
+        projection (dict) -- fields to return
+        chunk_size (int) -- values per query
+    Returns:
+        (dict) -- value: document, for the values that were found
+    '''
+    values = list(set(values))
+    found = {}
+
+    for i in xrange(0, len(values), chunk_size):
+        for doc in collection.find({field: {'$in': values[i:i + chunk_size]}}, projection):
+            found[doc[field]] = doc
+
+    return found
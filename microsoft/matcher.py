@@ -0,0 +1,194 @@
+'''Fuzzy publication title matching against ElasticSearch
+'''
+
+import json, math, multiprocessing
+from titles import MSString
+
+class TitleMatcher:
+    '''Find Microsoft publications for a batch of titles
+
+    Candidates for a whole batch are retrieved with a single ElasticSearch
+    _msearch request, then verified in a process pool with the LCS rules: an
+    exact match, or an LCS of at least `min_lcs` of the longer title, with
+    `sub_boost` added when the shorter title is contained entirely.
+    '''
+    def __init__(self, client, url, size = 5, min_lcs = .9, sub_boost = .2, processes = None):
+        '''
+        Args:
+            client (Client) -- shared HTTP client
+            url (str) -- ElasticSearch publications url
+            size (int) -- candidates retrieved per title
+            min_lcs (float) -- minimum LCS ratio of the longer title
+            sub_boost (float) -- ratio added for substrings
+            processes (int) -- verification processes, defaults to the number of cores
+        '''
+        self.client = client
+        self.url = url
+        self.size = int(size)
+        self.min_lcs = min_lcs
+        self.sub_boost = sub_boost
+        self.processes = int(processes) if processes else multiprocessing.cpu_count()
+        self.pool = None
+        self.stats = {'titles': 0, 'matched': 0, 'rejected': 0, 'missing': 0, 'pairs': 0, 'stopped': 0}
+
+    def candidates(self, titles):
+        '''Get top candidates for each title
+        Args:
+            titles (list) -- titles (str)
+        Returns:
+            (list) -- list of ElasticSearch hits for each title
+        '''
+        if(not titles):
+            return []
+
+        body = ''
+        for title in titles:
+            query = {'size': self.size, '_source': ['Id', 'Ti'], 'query': {'match': {'Ti': title}}}
+            body += '{}\n' + json.dumps(query) + '\n'
+
+        r = self.client.post(self.url + '_msearch', data = body, headers = {'Content-Type': 'application/x-ndjson'})
+
+        return [response.get('hits', {}).get('hits', []) for response in r.json()['responses']]
+
+    def rank(self, titles, candidates):
+        '''Verify candidates and pick the best match for each title
+        Args:
+            titles (list) -- titles (str)
+            candidates (list) -- ElasticSearch hits for each title
+        Returns:
+            (list) -- (hit, result) of the best match for each title; hit is None when
+                no candidate matches, and result is then the top candidate's result (or None)
+        '''
+        tasks = []
+        for title, hits in zip(titles, candidates):
+            ms_titles = [MSString(h['_source']['Ti'], encode = 'utf-8').convert() for h in hits]
+            tasks.append((MSString(title).convert(), ms_titles, self.min_lcs, self.sub_boost))
+
+        if(self.pool is None):
+            self.pool = multiprocessing.Pool(self.processes)
+
+        chunksize = max(1, len(tasks) // (self.processes * 4))
+        ranked = []
+        for hits, results in zip(candidates, self.pool.map(verify_candidates, tasks, chunksize)):
+            self.stats['titles'] += 1
+            self.stats['pairs'] += len(results)
+            self.stats['stopped'] += sum(1 for r in results if r['stopped'])
+
+            matched = [(r['score'], -i) for i, r in enumerate(results) if r['matched']]
+
+            if(matched):
+                i = -max(matched)[1]
+                self.stats['matched'] += 1
+                ranked.append((hits[i], results[i]))
+            else:
+                self.stats['rejected' if results else 'missing'] += 1
+                ranked.append((None, results[0] if results else None))
+
+        return ranked
+
+    def summary(self):
+        '''Get match statistics
+        Returns:
+            (str) -- titles matched, rejected and without candidates, pairs compared
+        '''
+        return '{matched} / {titles} titles matched, {rejected} rejected, {missing} without candidates ({pairs} pairs compared, {stopped} stopped early)'.format(**self.stats)
+
+    def close(self):
+        '''Stop the verification processes
+        '''
+        if(self.pool is not None):
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+def verify_candidates(task):
+    '''Verify every candidate of a title, run in the process pool
+    Args:
+        task (tuple) -- (title, candidate titles, min_lcs, sub_boost), titles normalized with MSString.convert
+    Returns:
+        (list) -- results of verify
+    '''
+    title, candidates, min_lcs, sub_boost = task
+    return [verify(title, candidate, min_lcs, sub_boost) for candidate in candidates]
+
+def verify(xd_title, ms_title, min_lcs = .9, sub_boost = .2):
+    '''Compare a title with a candidate title
+    Args:
+        xd_title (str) -- normalized title
+        ms_title (str) -- normalized Microsoft title
+        min_lcs (float) -- minimum LCS ratio of the longer title
+        sub_boost (float) -- ratio added for substrings
+    Returns:
+        (dict) -- matched (bool), lcs (int), rate (LCS over longer title), score, stopped (bool)
+            and both titles; when stopped, lcs is only an upper bound
+
+    >>> verify('climatemodeling', 'quantumchemistr')['matched']
+    False
+    >>> verify('climatemodeling', 'climatemodelinh')['matched']
+    True
+    '''
+    result = {'title': xd_title, 'candidate': ms_title, 'matched': False, 'lcs': 0, 'rate': 0.0, 'score': 0.0, 'stopped': False}
+
+    if(not xd_title or not ms_title):
+        return result
+
+    # exact match
+    if(xd_title == ms_title):
+        result.update({'matched': True, 'lcs': len(xd_title), 'rate': 1.0, 'score': 2.0})
+        return result
+
+    # sorted keeps both titles when their lengths are equal
+    shorter, longer = sorted((xd_title, ms_title), key = len)
+
+    # smallest LCS that can still match: the ratio alone, or the whole shorter title with the boost
+    need = int(math.ceil(min_lcs * len(longer) - 1e-9))
+    if(float(len(shorter)) / len(longer) + sub_boost >= min_lcs):
+        need = min(need, len(shorter))
+
+    lcs_len, complete = lcs_length(shorter, longer, need)
+    shorter_rate = float(lcs_len) / len(shorter)
+    longer_rate = float(lcs_len) / len(longer)
+
+    # give boost to substrings
+    boost = sub_boost if shorter_rate == 1.0 else 0
+    score = longer_rate + boost
+
+    # lcs (proportionally) greater than minimum lcs
+    result.update({'matched': complete and score >= min_lcs, 'lcs': lcs_len, 'rate': longer_rate, 'score': score, 'stopped': not complete})
+    return result
+
+def lcs_length(x, y, need = 0):
+    '''Bit-parallel longest common subsequence length (Allison-Dix / Hyyro)
+
+    Each row over y updates a bit vector over x in a few integer operations.
+    Stops early once the LCS can no longer reach `need`.
+    Args:
+        x (str) -- first string, preferably the shorter one
+        y (str) -- second string
+        need (int) -- smallest interesting LCS length
+    Returns:
+        (tuple) -- (LCS length, True) or (upper bound, False) when stopped early
+    '''
+    if(need > min(len(x), len(y))):
+        return min(len(x), len(y)), False
+
+    masks = {}
+    for i, c in enumerate(x):
+        masks[c] = masks.get(c, 0) | (1 << i)
+
+    full = (1 << len(x)) - 1
+    v = full
+    length = 0
+
+    for j, c in enumerate(y):
+        u = v & masks.get(c, 0)
+
+        if(u):
+            v = ((v + u) | (v - u)) & full
+            length = bin(full & ~v).count('1')
+
+        # each remaining row adds at most one
+        if(length + len(y) - j - 1 < need):
+            return length + len(y) - j - 1, False
+
+    return length, True
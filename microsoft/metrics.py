@@ -0,0 +1,216 @@
+'''Bibliometric indices (h, g, i10, m) for groups of publications
+'''
+
+import csv
+import numpy
+
+# report columns, in order
+columns = ['# of Pubs', '# of Pubs (recent)', 'Cited by', 'Cited by (recent)', 'H-index', 'H-index (recent)',
+    'H-index (m)', 'G-index', 'G-index (recent)', 'i10-index', 'i10-index (recent)']
+
+# grouping: (snapshot column, publication field, csv key column)
+groupings = {
+    'org': ('AfN', 'AA.AfN', 'Organization'),
+    'fos': ('L0', 'F.L0', 'fos'),
+    'journal': ('JId', 'J.JId', 'JId'),
+    'year': ('Y', 'Y', 'Y'),
+}
+
+class Groups:
+    '''Publications grouped by organization, field of study, journal or year
+
+    Every (publication, group) pair is one row of the parallel arrays `pubs`
+    (publication position) and `groups` (group code); a publication appears
+    at most once per group. `citations` and `years` hold one value per
+    publication and `names` the name of each group code.
+    '''
+    def __init__(self, pubs, groups, citations, years, names):
+        '''
+        Args:
+            pubs (ndarray) -- publication position of each pair
+            groups (ndarray) -- group code of each pair
+            citations (ndarray) -- citation count of each publication
+            years (ndarray) -- year of each publication, -1 when missing
+            names (list) -- name of each group code
+        '''
+        self.pubs = numpy.asarray(pubs, dtype = 'int64')
+        self.groups = numpy.asarray(groups, dtype = 'int64')
+        self.citations = numpy.maximum(numpy.asarray(citations, dtype = 'int64'), 0)
+        self.years = numpy.asarray(years, dtype = 'int64')
+        self.names = names
+
+    @classmethod
+    def from_snapshot(cls, snapshot, by, ids = None):
+        '''Group snapshot publications
+        Args:
+            snapshot (Snapshot) -- loaded publications snapshot
+            by (str) -- grouping, one of groupings
+            ids (iterable) -- publication ids to include, all by default
+        Returns:
+            (Groups) -- grouped publications
+        '''
+        name = groupings[by][0]
+        selected = numpy.ones(len(snapshot), dtype = bool)
+        if(ids is not None):
+            selected = numpy.in1d(snapshot['Id'], numpy.asarray(list(ids), dtype = 'int64'))
+
+        if(name in snapshot.meta['columns']):
+            values = numpy.asarray(snapshot[name])
+            pubs = numpy.flatnonzero(selected & (values != -1))
+            codes, groups = numpy.unique(values[pubs], return_inverse = True)
+            names = [int(code) for code in codes]
+        else:
+            offsets, values = snapshot.csr(name)
+            pubs = numpy.repeat(numpy.arange(len(snapshot)), numpy.diff(offsets))
+            keep = selected[pubs]
+            pubs = pubs[keep]
+            groups = numpy.asarray(values)[keep]
+            names = snapshot.names(name)
+
+        # only keep selected publications, renumbered
+        positions = numpy.flatnonzero(selected)
+        return cls(numpy.searchsorted(positions, pubs), groups, numpy.asarray(snapshot['CC'])[positions],
+            numpy.asarray(snapshot['Y'])[positions], names)
+
+    @classmethod
+    def from_documents(cls, pubs, by):
+        '''Group publication documents
+        Args:
+            pubs (iterable) -- publications with CC, Y and the grouping field
+            by (str) -- grouping, one of groupings
+        Returns:
+            (Groups) -- grouped publications
+        '''
+        field = groupings[by][1]
+        codes = {}
+        pairs = []
+        citations = []
+        years = []
+
+        for i, pub in enumerate(pubs):
+            citations.append(pub.get('CC', 0))
+            years.append(pub.get('Y', -1))
+
+            for value in set(field_values(pub, field)):
+                pairs.append((i, codes.setdefault(value, len(codes))))
+
+        pairs = numpy.array(pairs, dtype = 'int64').reshape(-1, 2)
+        return cls(pairs[:, 0], pairs[:, 1], citations, years, sorted(codes, key = codes.get))
+
+    def totals(self):
+        '''Group all publications together
+        Returns:
+            (Groups) -- a single group, named '', holding every grouped publication
+        '''
+        pubs = numpy.unique(self.pubs)
+        return Groups(pubs, numpy.zeros(len(pubs), dtype = 'int64'), self.citations, self.years, [''])
+
+    def indices(self, year = None, recent = 5):
+        '''Compute the indices of every group
+        Args:
+            year (int) -- current year, defaults to the latest publication year
+            recent (int) -- number of years, up to the current year, counted as recent
+        Returns:
+            (dict) -- column: array with one value per group
+        '''
+        if(year is None):
+            year = int(self.years.max()) if len(self.years) else 0
+
+        size = len(self.names)
+        years = self.years[self.pubs]
+        citations = self.citations[self.pubs]
+        is_recent = (years > year - recent) & (years <= year)
+
+        table = {}
+        table['# of Pubs'], table['Cited by'], table['H-index'], table['G-index'], table['i10-index'] = \
+            group_indices(self.groups, citations, size)
+        table['# of Pubs (recent)'], table['Cited by (recent)'], table['H-index (recent)'], table['G-index (recent)'], table['i10-index (recent)'] = \
+            group_indices(self.groups[is_recent], citations[is_recent], size)
+
+        # h-index divided by the years since the first publication of the group
+        first = numpy.full(size, year, dtype = 'int64')
+        known = years > 0
+        numpy.minimum.at(first, self.groups[known], years[known])
+        table['H-index (m)'] = numpy.round(table['H-index'] / numpy.maximum(year - first + 1, 1.0), 3)
+
+        return table
+
+def group_indices(groups, citations, size):
+    '''Grouped h, g and i10 indices over sorted citation arrays
+    Args:
+        groups (ndarray) -- group code of each publication
+        citations (ndarray) -- citation count of each publication
+        size (int) -- number of groups
+    Returns:
+        (tuple) -- arrays of publication count, citation sum, h-index, g-index and
+            i10-index of each group
+    '''
+    # by group, most cited first
+    order = numpy.lexsort((-citations, groups))
+    groups = groups[order]
+    citations = citations[order]
+
+    # 1-based rank within the group and running citation sum within the group
+    start = numpy.searchsorted(groups, groups)
+    rank = numpy.arange(1, len(groups) + 1) - start
+    total = numpy.cumsum(citations)
+    running = total - (total - citations)[start]
+
+    count = lambda mask: numpy.bincount(groups, weights = mask, minlength = size).astype('int64')
+
+    # h: ranks with at least rank citations, g: ranks whose top citations sum to at least rank squared
+    return (numpy.bincount(groups, minlength = size), count(citations), count(citations >= rank),
+        count(running >= rank ** 2), count(citations >= 10))
+
+def field_values(pub, field):
+    '''Get the values of a (possibly nested list) field of a publication
+    Args:
+        pub (dict) -- publication
+        field (str) -- dotted field name, e.g. AA.AfN
+    Returns:
+        (list) -- values present
+    '''
+    values = [pub]
+    for key in field.split('.'):
+        found = []
+        for value in values:
+            value = value.get(key) if isinstance(value, dict) else None
+            if(isinstance(value, list)):
+                found.extend(value)
+            elif(value not in (None, '')):
+                found.append(value)
+        values = found
+
+    return values
+
+def write_csv(filename, key, groups, table, totals = None):
+    '''Write a table of indices, most publications first
+    Args:
+        filename (str) -- output csv
+        key (str) -- name of the group column
+        groups (Groups) -- grouped publications
+        table (dict) -- indices of each group
+        totals (dict) -- indices of all publications, written first with an empty name
+    '''
+    with open(filename, 'wb') as f:
+        writer = csv.writer(f)
+        writer.writerow([key] + columns)
+
+        rows = [('', totals, 0)] if totals else []
+        for i in numpy.argsort(-table['# of Pubs'], kind = 'mergesort'):
+            if(table['# of Pubs'][i]):
+                rows.append((groups.names[i], table, i))
+
+        for name, values, i in rows:
+            name = name.encode('utf-8') if isinstance(name, unicode) else name
+            writer.writerow([name] + [format_value(values[column][i]) for column in columns])
+
+def format_value(value):
+    '''Format an index for the csv
+    Args:
+        value (number) -- index value
+    Returns:
+        (str) -- integer, or up to 3 decimals
+    '''
+    value = round(float(value), 3)
+    return str(int(value)) if value.is_integer() else str(value)
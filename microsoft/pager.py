@@ -0,0 +1,117 @@
+'''Concurrent page retrieval for the Microsoft Knowledge API
+'''
+
+import time, threading, functools
+from Queue import Queue
+
+class RateLimiter:
+    '''Spread requests evenly over time
+    '''
+    def __init__(self, rate = 0):
+        '''
+        Args:
+            rate (float) -- requests per second, 0 for no limit
+        '''
+        rate = float(rate or 0)
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        '''Block until the next request slot is available
+        '''
+        if(not self.interval):
+            return
+
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_call)
+            self.next_call = slot + self.interval
+
+        if(slot > now):
+            time.sleep(slot - now)
+
+class Pager:
+    '''Page through several windows (month, or January letter) at once
+
+    A task is a (window, offset) pair. A full page schedules the next offset of
+    its window, so up to `workers` windows are in flight at any time.
+    '''
+    def __init__(self, fetch, hook, commit = None, workers = 4):
+        '''
+        Args:
+            fetch (function) -- fetch(window, offset), returns list of entities
+            hook (function) -- hook(entities, callback), hands a finished page to the writer stage
+            commit (function) -- commit(window, offset, complete), called once a page is written
+            workers (int) -- number of concurrent requests
+        '''
+        self.fetch = fetch
+        self.hook = hook
+        self.commit = commit or (lambda window, offset, complete: None)
+        self.workers = max(1, int(workers))
+        self.error = None
+
+    def run(self, tasks, count):
+        '''Retrieve every remaining page of every window
+        Args:
+            tasks (list) -- of (window, offset) tuples
+            count (int) -- results per call
+        '''
+        self.count = int(count)
+        self.error = None
+        self.tasks = Queue()
+
+        for task in tasks:
+            self.tasks.put(task)
+
+        threads = []
+        for i in xrange(self.workers):
+            thread = threading.Thread(target = self.work)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        self.tasks.join()
+
+        for thread in threads:
+            self.tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+        if(self.error):
+            raise self.error
+
+    def work(self):
+        '''Worker loop, fetch pages until a None task is received
+        '''
+        while(True):
+            task = self.tasks.get()
+
+            if(task is None):
+                self.tasks.task_done()
+                break
+
+            window, offset = task
+            try:
+                # drain remaining tasks once a worker has failed
+                if(not self.error):
+                    self.page(window, offset)
+            except Exception as err:
+                self.error = self.error or err
+            finally:
+                self.tasks.task_done()
+
+    def page(self, window, offset):
+        '''Fetch one page and schedule the next one
+        Args:
+            window (dict) -- window to retrieve
+            offset (int) -- offset within the window
+        '''
+        entities = self.fetch(window, offset)
+        complete = len(entities) < self.count
+
+        # empty pages go through the writer too, so commits stay in order
+        self.hook(entities, functools.partial(self.commit, window, offset + len(entities), complete))
+
+        if(not complete):
+            self.tasks.put((window, offset + self.count))
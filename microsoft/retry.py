@@ -0,0 +1,116 @@
+'''Retry policy and circuit breaker for API requests
+'''
+
+import time, random, threading, email.utils
+
+class RetryPolicy:
+    '''Exponential backoff with full jitter
+    '''
+    def __init__(self, base = 1.0, cap = 120.0, max_retries = 10):
+        '''
+        Args:
+            base (float) -- delay of the first retry, in seconds
+            cap (float) -- maximum delay, in seconds
+            max_retries (int) -- attempts before giving up
+        '''
+        self.base = float(base)
+        self.cap = float(cap)
+        self.max_retries = int(max_retries)
+
+    def delay(self, attempt):
+        '''Get delay before a retry
+        Args:
+            attempt (int) -- number of failed attempts so far
+        Returns:
+            (float) -- seconds to wait
+        '''
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+def retry_after(response):
+    '''Get Retry-After header value
+    Args:
+        response (Response) -- HTTP response
+    Returns:
+        (float) -- seconds to wait, None if the header is missing or invalid
+    '''
+    value = response.headers.get('Retry-After')
+
+    if(not value):
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # HTTP date
+    date = email.utils.parsedate_tz(value)
+    if(date):
+        return max(0.0, email.utils.mktime_tz(date) - time.time())
+
+    return None
+
+class CircuitBreaker:
+    '''Pause all workers together while the service is failing
+
+    After `threshold` consecutive failures (or any throttling response) the
+    circuit opens and every worker waits in wait(). The first request after the
+    pause is a probe: a success closes the circuit and resets the pause, another
+    failure opens it again for twice as long, up to `max_cooldown`.
+    '''
+    def __init__(self, threshold = 5, cooldown = 15.0, max_cooldown = 600.0):
+        '''
+        Args:
+            threshold (int) -- consecutive failures before opening
+            cooldown (float) -- first pause, in seconds
+            max_cooldown (float) -- longest pause, in seconds
+        '''
+        self.threshold = int(threshold)
+        self.base_cooldown = float(cooldown)
+        self.max_cooldown = float(max_cooldown)
+        self.cooldown = self.base_cooldown
+        self.failures = 0
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        '''Block while the circuit is open
+        '''
+        while(True):
+            with self.lock:
+                remaining = self.open_until - time.time()
+
+            if(remaining <= 0):
+                return
+
+            time.sleep(remaining)
+
+    def success(self):
+        '''Record a successful request, closing the circuit
+        '''
+        with self.lock:
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+
+    def failure(self, pause = None):
+        '''Record a failed request
+        Args:
+            pause (float) -- open the circuit for at least this long (e.g. Retry-After)
+        '''
+        with self.lock:
+            self.failures += 1
+
+            if(pause is None and self.failures < self.threshold):
+                return
+
+            if(pause is None):
+                pause = self.cooldown
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+
+            until = time.time() + pause
+
+            if(until > self.open_until):
+                self.open_until = until
+                print "Pausing requests for {:.0f}s ...".format(pause)
+
+            self.failures = 0
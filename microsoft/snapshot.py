@@ -0,0 +1,237 @@
+'''Columnar snapshot of the publications collection
+'''
+
+import os, json
+import numpy
+
+class Snapshot:
+    '''Memory-mapped, columnar copy of publications for offline analysis
+
+    Publications are stored in Id order. Scalar columns hold one value per
+    publication (-1 when missing). List columns are stored CSR style: values of
+    publication i are values[offsets[i]:offsets[i + 1]]. Text lists (affiliation
+    names, top-level fields) are dictionary encoded, with the names kept in
+    meta.json. The Ids of XSEDE publications are stored too (xsede), so
+    analyses of a snapshot do not need the database. Every array is a raw
+    file, described in meta.json.
+    '''
+    columns = [('Id', 'int64'), ('Y', 'int16'), ('CC', 'int32'), ('ECC', 'int32'), ('JId', 'int64'), ('CId', 'int64'), ('Pt', 'int16')]
+    lists = [('AuId', 'int64'), ('AfId', 'int64'), ('FId', 'int64'), ('RId', 'int64')]
+    text_lists = ['AfN', 'L0']
+    projection = {'_id': 0, 'Id': 1, 'Y': 1, 'CC': 1, 'ECC': 1, 'Pt': 1, 'J.JId': 1, 'C.CId': 1, 'AA.AuId': 1, 'AA.AfId': 1, 'AA.AfN': 1, 'F.FId': 1, 'F.L0': 1, 'RId': 1}
+
+    def __init__(self, path):
+        '''
+        Args:
+            path (str) -- snapshot directory
+        '''
+        self.path = path
+        self.meta = None
+
+    @classmethod
+    def export(cls, collection, path, xsede = None, chunk_size = 100000):
+        '''Write a snapshot of a publications collection
+        Args:
+            collection (Collection) -- publications collection
+            path (str) -- snapshot directory
+            xsede (Collection) -- XSEDE publications, their Ids are stored with the snapshot
+            chunk_size (int) -- publications converted per chunk
+        Returns:
+            (Snapshot) -- loaded snapshot
+        '''
+        if(not os.path.isdir(path)):
+            os.makedirs(path)
+
+        records = collection.find({}, cls.projection).sort('Id', 1).batch_size(10000)
+        total = records.count()
+
+        files = {}
+        for name, dtype in cls.columns:
+            files[name] = open(os.path.join(path, name), 'wb')
+        for name in [n for n, t in cls.lists] + cls.text_lists:
+            files[name + '.offsets'] = open(os.path.join(path, name + '.offsets'), 'wb')
+            files[name + '.values'] = open(os.path.join(path, name + '.values'), 'wb')
+            # offsets start at 0
+            numpy.zeros(1, dtype = 'int64').tofile(files[name + '.offsets'])
+
+        names = dict((name, {}) for name in cls.text_lists)
+        lengths = dict((name, 0) for name in [n for n, t in cls.lists] + cls.text_lists)
+        count = 0
+
+        chunk = []
+        for record in records:
+            chunk.append(record)
+
+            if(len(chunk) >= chunk_size):
+                cls.write_chunk(chunk, files, names, lengths)
+                count += len(chunk)
+                chunk = []
+                print "{}/{}".format(count, total)
+
+        if(chunk):
+            cls.write_chunk(chunk, files, names, lengths)
+            count += len(chunk)
+
+        for f in files.values():
+            f.close()
+
+        meta = {'count': count, 'columns': dict(cls.columns), 'lists': dict(cls.lists), 'lengths': lengths}
+
+        if(xsede is not None):
+            ids = numpy.unique(numpy.array([x['Id'] for x in xsede.find({}, {'Id': 1, '_id': 0})], dtype = 'int64'))
+            ids.tofile(os.path.join(path, 'xsede'))
+            meta['xsede'] = len(ids)
+        meta['names'] = dict((name, sorted(codes, key = codes.get)) for name, codes in names.iteritems())
+
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        return cls(path).load()
+
+    @classmethod
+    def write_chunk(cls, chunk, files, names, lengths):
+        '''Append a chunk of publications to the snapshot files
+        Args:
+            chunk (list) -- publication documents
+            files (dict) -- open array files
+            names (dict) -- text list name: {text: code}
+            lengths (dict) -- list name: number of values written so far
+        '''
+        for name, dtype in cls.columns:
+            numpy.array([extract(record, name) for record in chunk], dtype = dtype).tofile(files[name])
+
+        for name, dtype in cls.lists:
+            values = [extract_list(record, name) for record in chunk]
+            cls.write_list(name, values, dtype, files, lengths)
+
+        for name in cls.text_lists:
+            codes = names[name]
+            values = [[codes.setdefault(v, len(codes)) for v in extract_list(record, name)] for record in chunk]
+            cls.write_list(name, values, 'int32', files, lengths)
+
+    @classmethod
+    def write_list(cls, name, values, dtype, files, lengths):
+        '''Append CSR offsets and values of a list column
+        Args:
+            name (str) -- list name
+            values (list) -- list of values for each publication
+            dtype (str) -- value type
+            files (dict) -- open array files
+            lengths (dict) -- list name: number of values written so far
+        '''
+        sizes = numpy.array([len(v) for v in values], dtype = 'int64')
+        (numpy.cumsum(sizes) + lengths[name]).tofile(files[name + '.offsets'])
+        numpy.array([x for v in values for x in v], dtype = dtype).tofile(files[name + '.values'])
+        lengths[name] += int(sizes.sum())
+
+    def load(self):
+        '''Read snapshot metadata
+        Returns:
+            (Snapshot) -- self
+        '''
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        return self
+
+    def array(self, name, dtype, length):
+        '''Memory-map a raw array file
+        Args:
+            name (str) -- file name
+            dtype (str) -- value type
+            length (int) -- number of values
+        Returns:
+            (ndarray) -- read-only memory map
+        '''
+        if(length == 0):
+            return numpy.zeros(0, dtype = dtype)
+
+        return numpy.memmap(os.path.join(self.path, name), dtype = dtype, mode = 'r', shape = (length,))
+
+    def __len__(self):
+        return self.meta['count']
+
+    def __getitem__(self, name):
+        '''Get a scalar column
+        Args:
+            name (str) -- column name, e.g. Id, Y, CC
+        Returns:
+            (ndarray) -- one value per publication
+        '''
+        return self.array(name, self.meta['columns'][name], self.meta['count'])
+
+    def csr(self, name):
+        '''Get a list column
+        Args:
+            name (str) -- list name, e.g. RId, FId, L0
+        Returns:
+            (tuple) -- (offsets, values) arrays
+        '''
+        dtype = self.meta['lists'].get(name, 'int32')
+        offsets = self.array(name + '.offsets', 'int64', self.meta['count'] + 1)
+        values = self.array(name + '.values', dtype, self.meta['lengths'][name])
+        return offsets, values
+
+    def xsede(self):
+        '''Get the Ids of XSEDE publications stored with the snapshot
+        Returns:
+            (list) -- publication Ids
+        '''
+        if('xsede' not in self.meta):
+            raise ValueError('{} has no XSEDE Ids, export the snapshot again'.format(self.path))
+
+        return self.array('xsede', 'int64', self.meta['xsede']).tolist()
+
+    def names(self, name):
+        '''Get the text of a dictionary encoded list
+        Args:
+            name (str) -- text list name, AfN or L0
+        Returns:
+            (list) -- text for each code
+        '''
+        return self.meta['names'][name]
+
+def extract(record, name):
+    '''Get a scalar column value from a publication
+    Args:
+        record (dict) -- publication
+        name (str) -- column name
+    Returns:
+        (int) -- value, -1 when missing
+    '''
+    if(name == 'JId'):
+        return record.get('J', {}).get('JId', -1)
+    if(name == 'CId'):
+        return record.get('C', {}).get('CId', -1)
+
+    return record.get(name, -1)
+
+def extract_list(record, name):
+    '''Get a list column value from a publication
+    Args:
+        record (dict) -- publication
+        name (str) -- list name
+    Returns:
+        (list) -- values, missing entries are skipped
+    '''
+    if(name == 'RId'):
+        return record.get('RId', [])
+    if(name == 'AuId'):
+        return [a[name] for a in record.get('AA', []) if name in a]
+    # affiliations and fields are counted once per publication
+    if(name in ('AfId', 'AfN')):
+        return unique(a[name] for a in record.get('AA', []) if a.get(name))
+    if(name in ('FId', 'L0')):
+        return unique(f[name] for f in record.get('F', []) if name in f)
+
+    return []
+
+def unique(values):
+    '''Remove duplicates, keeping order
+    Args:
+        values (iterable) -- values
+    Returns:
+        (list) -- first occurrence of each value
+    '''
+    seen = set()
+    return [v for v in values if not (v in seen or seen.add(v))]
@@ -0,0 +1,90 @@
+'''Title normalization
+'''
+
+import string, functools, threading, collections
+
+def lru_cache(maxsize = 100000):
+    '''Memoize a function of hashable positional arguments, least recently used first out
+    Args:
+        maxsize (int) -- maximum number of cached results
+    Returns:
+        (function) -- decorator
+    '''
+    def decorator(func):
+        cache = collections.OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            with lock:
+                if(args in cache):
+                    value = cache.pop(args)
+                    cache[args] = value
+                    return value
+
+            value = func(*args)
+
+            with lock:
+                cache[args] = value
+                if(len(cache) > maxsize):
+                    cache.popitem(last = False)
+
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+@lru_cache()
+def clean_title(ms_string, encode = '', decode = ''):
+    '''Replace separators, remove punctuation and lowercase
+    Args:
+        ms_string (str|unicode) -- title
+        encode (str) -- encoding to encode to
+        decode (str) -- encoding to decode from
+    Returns:
+        (str) -- cleaned title
+    '''
+    ms_string = ms_string.decode(decode) if decode else ms_string
+    ms_string = ms_string.encode(encode) if encode else ms_string
+
+    ms_string = ms_string.replace('-', ' ')
+    ms_string = ms_string.replace('/', ' ')
+    ms_string = ms_string.replace('+', ' ')
+    ms_string = str(ms_string).translate(None, string.punctuation)
+    return ms_string.lower()
+
+@lru_cache()
+def convert_title(ms_string):
+    '''Remove whitespace and non-printable characters
+    Args:
+        ms_string (str) -- cleaned title
+    Returns:
+        (str) -- converted title
+    '''
+    # remove whitespace
+    ms_string = ms_string.translate(None, string.whitespace)
+    # remove non-printable characters
+    return ''.join(s for s in ms_string if s in string.printable)
+
+def normalize_title(title, encode = 'utf-8', decode = ''):
+    '''Get the normalized form of a title, as stored in publications.Ti_norm
+    Args:
+        title (str|unicode) -- title
+        encode (str) -- encoding to encode to
+        decode (str) -- encoding to decode from
+    Returns:
+        (str) -- normalized title
+    '''
+    return convert_title(clean_title(title, encode, decode))
+
+class MSString:
+    def __init__(self, ms_string, encode = '', decode = ''):
+        self.ms_string = clean_title(ms_string, encode, decode)
+
+    def convert(self):
+        self.ms_string = convert_title(self.ms_string)
+        return self.ms_string
+
+    def to_string(self):
+        return self.ms_string
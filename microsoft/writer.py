@@ -0,0 +1,183 @@
+'''Background MongoDB writer stage
+'''
+
+import time, json, hashlib, threading
+from Queue import Queue, Empty
+import pymongo
+
+class Writer(threading.Thread):
+    '''Upsert pages of documents on a separate thread
+
+    Pages are combined into large unordered bulk writes. Every document is
+    stored with a content hash (_h), and documents whose hash has not changed
+    since the last crawl are skipped. The Ids of documents that were written
+    are recorded in a change log, so derived data can be refreshed for them
+    only. The queue is bounded, so retrieval blocks instead of running
+    arbitrarily far ahead of the database.
+    '''
+    def __init__(self, db, batch_size = 10000, queue_size = 16, idle = 1.0, changes = 'changes'):
+        '''
+        Args:
+            db (Database) -- MongoDB database
+            batch_size (int) -- documents per bulk write
+            queue_size (int) -- maximum number of pages waiting to be written
+            idle (float) -- seconds without new pages before a partial batch is written
+            changes (str) -- change log collection, None to disable
+        '''
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.db = db
+        self.batch_size = int(batch_size)
+        self.queue = Queue(int(queue_size))
+        self.idle = idle
+        self.changes = changes
+        self.pending = {}
+        self.error = None
+        self.written = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    def put(self, collection, docs, callback = None):
+        '''Queue a page of documents
+        Args:
+            collection (str) -- collection name
+            docs (list) -- documents, upserted by Id
+            callback (function) -- called once the page has been written
+        '''
+        if(self.error):
+            raise self.error
+
+        self.queue.put((collection, docs, callback))
+
+    def run(self):
+        while(True):
+            try:
+                item = self.queue.get(timeout = self.idle)
+            except Empty:
+                self.flush_all()
+                continue
+
+            if(item is None):
+                self.flush_all()
+                break
+
+            # keep draining the queue so producers do not block
+            if(self.error):
+                continue
+
+            collection, docs, callback = item
+            batch = self.pending.setdefault(collection, {'docs': [], 'callbacks': []})
+            batch['docs'].extend(docs)
+
+            if(callback):
+                batch['callbacks'].append(callback)
+
+            if(len(batch['docs']) >= self.batch_size):
+                self.flush(collection)
+
+    def flush_all(self):
+        '''Write every partial batch
+        '''
+        for collection in self.pending.keys():
+            self.flush(collection)
+
+    def flush(self, collection):
+        '''Write the pending batch of a collection, then run its callbacks
+        A failed write stops the writer, its callbacks are not run
+        Args:
+            collection (str) -- collection name
+        '''
+        batch = self.pending.pop(collection, None)
+
+        if(not batch or self.error):
+            return
+
+        try:
+            self.write(collection, batch['docs'])
+
+            for callback in batch['callbacks']:
+                callback()
+        except Exception as err:
+            self.error = err
+
+    def write(self, collection, docs):
+        '''Upsert documents by Id, skipping unchanged documents
+        Args:
+            collection (str) -- collection name
+            docs (list) -- documents
+        '''
+        if(not docs):
+            return
+
+        start = time.time()
+
+        # last copy of a document wins
+        latest = {}
+        for doc in docs:
+            doc['_h'] = content_hash(doc)
+            latest[doc['Id']] = doc
+
+        stored = self.db[collection].find({'Id': {'$in': latest.keys()}}, {'Id': 1, '_h': 1, '_id': 0})
+        unchanged = set(d['Id'] for d in stored if d.get('_h') == latest[d['Id']]['_h'])
+
+        changed = [i for i in latest if i not in unchanged]
+        ops = [pymongo.ReplaceOne({'Id': i}, latest[i], upsert = True) for i in changed]
+
+        if(ops):
+            try:
+                self.db[collection].bulk_write(ops, ordered = False)
+            except pymongo.errors.BulkWriteError as bwe:
+                print bwe.details
+
+                # the rest of an unordered batch was written, it will be skipped as unchanged on resume
+                failed = set(e['index'] for e in bwe.details.get('writeErrors', []))
+                if(self.changes):
+                    self.log_changes(collection, [i for n, i in enumerate(changed) if n not in failed])
+                raise
+
+            if(self.changes):
+                self.log_changes(collection, changed)
+
+        self.written += len(ops)
+        self.skipped += len(docs) - len(ops)
+        self.seconds += time.time() - start
+
+    def log_changes(self, collection, ids):
+        '''Record written documents in the change log
+        Args:
+            collection (str) -- collection name
+            ids (list) -- Ids of the written documents
+        '''
+        if(not ids):
+            return
+
+        now = time.time()
+        ops = [pymongo.UpdateOne({'c': collection, 'Id': i}, {'$set': {'t': now}}, upsert = True) for i in ids]
+        self.db[self.changes].bulk_write(ops, ordered = False)
+
+    def summary(self):
+        '''Get write statistics
+        Returns:
+            (str) -- documents written, skipped and write throughput
+        '''
+        rate = self.written / self.seconds if self.seconds else 0
+        return '{} documents written, {} unchanged, {:.0f} documents/s'.format(self.written, self.skipped, rate)
+
+    def close(self):
+        '''Write remaining pages and stop the thread
+        '''
+        self.queue.put(None)
+        self.join()
+
+        if(self.error):
+            raise self.error
+
+def content_hash(doc):
+    '''Hash a document's content
+    Args:
+        doc (dict) -- document
+    Returns:
+        (str) -- md5 of the document without _id and _h
+    '''
+    content = dict((k, v) for k, v in doc.iteritems() if k not in ('_id', '_h'))
+    return hashlib.md5(json.dumps(content, sort_keys = True, default = str)).hexdigest()
@@ -0,0 +1,125 @@
+import csv, json, os
+import requests
+
+# columns parsed as numbers, all others stay text
+types = {
+    '# of Pubs': int, '# of Pubs (recent)': int, 'Cited by': int, 'Cited by (recent)': int,
+    'H-index': int, 'H-index (recent)': int, 'H-index (m)': float, 'G-index': int, 'G-index (recent)': int,
+    'i10-index': int, 'i10-index (recent)': int, 'location_latitude': float, 'location_longitude': float,
+}
+
+class DataSource:
+    '''Report data, read from a local csv
+
+    With refresh, the csv is first downloaded again into the cache directory,
+    using a conditional request (ETag / Last-Modified), so an unchanged file
+    is not transferred. The newer of the cached and local copies is read, so
+    offline runs and failed downloads use the local data. The csv is parsed
+    once into rows with typed values.
+    '''
+    def __init__(self, filename, url = None, cache_dir = '.cache'):
+        '''
+        Args:
+            filename (string) -- local csv
+            url (string) -- remote copy of the csv
+            cache_dir (string) -- directory for downloaded copies
+        '''
+        self.filename = filename
+        self.url = url
+        self.cache_dir = cache_dir
+        self.cache_file = os.path.join(cache_dir, os.path.basename(filename))
+        self.meta_file = self.cache_file + '.json'
+        self.rows = None
+
+    def path(self, refresh = False):
+        '''Get the csv to read
+        Args:
+            refresh (bool) -- download the remote copy if it changed
+        Returns:
+            (string) -- the newer of the cached copy and the local csv
+        '''
+        if(refresh and self.url):
+            self.fetch()
+
+        if(os.path.isfile(self.cache_file) and (not os.path.isfile(self.filename) or os.path.getmtime(self.cache_file) > os.path.getmtime(self.filename))):
+            return self.cache_file
+
+        return self.filename
+
+    def fetch(self):
+        '''Download the remote copy into the cache, if it changed
+        Returns:
+            (bool) -- whether a new copy was downloaded
+        '''
+        meta = {}
+        if(os.path.isfile(self.meta_file) and os.path.isfile(self.cache_file)):
+            with open(self.meta_file) as f:
+                meta = json.load(f)
+
+        headers = {}
+        if(meta.get('etag')):
+            headers['If-None-Match'] = meta['etag']
+        if(meta.get('last_modified')):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            r = requests.get(self.url, headers = headers, timeout = 30)
+        except requests.exceptions.RequestException as err:
+            print 'Could not refresh ' + self.url + ' (' + str(err) + '), using local data'
+            return False
+
+        if(r.status_code == 304):
+            return False
+
+        if(r.status_code != 200):
+            print 'Could not refresh ' + self.url + ' (HTTP ' + str(r.status_code) + '), using local data'
+            return False
+
+        if(not os.path.isdir(self.cache_dir)):
+            os.makedirs(self.cache_dir)
+
+        with open(self.cache_file, 'wb') as f:
+            f.write(r.content)
+
+        with open(self.meta_file, 'w') as f:
+            json.dump({'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}, f)
+
+        return True
+
+    def load(self, refresh = False):
+        '''Read the csv into typed rows, once
+        Args:
+            refresh (bool) -- download the remote copy first if it changed
+        Returns:
+            (list) -- rows (dict)
+        '''
+        if(self.rows is None or refresh):
+            with open(self.path(refresh), 'rb') as f:
+                self.rows = [parse_row(row) for row in csv.DictReader(f)]
+
+        return self.rows
+
+def parse_row(row):
+    '''Convert the numeric columns of a row
+    Args:
+        row (dict) -- csv row
+    Returns:
+        (dict) -- row with numbers for the columns in types
+    '''
+    return dict((column, convert(value, types[column]) if column in types else value) for column, value in row.iteritems())
+
+def convert(value, kind):
+    '''Parse a number
+    Args:
+        value (string) -- csv value
+        kind (type) -- int or float
+    Returns:
+        (int|float) -- value, a float if an int column holds a fraction, None if empty or invalid
+    '''
+    for parse in (kind, float):
+        try:
+            return parse(value)
+        except ValueError:
+            pass
+
+    return None
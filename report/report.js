@@ -1,13 +1,17 @@
+// chart series generated from the publications collection (ak_api.py charts)
+var chartsUrl = 'charts.json';
+
 $(function() {
+    $.getJSON(chartsUrl, function(charts){
+        drawTypeChart(charts.types);
+        drawYearChart(charts.years);
+    });
+});
+
+function drawTypeChart(types){
     var series = [{
         name: 'Publication Type Percentage',
-        data: [
-            {name:'Journal Paper', y:6321},
-            {name:'None', y:3266},
-            {name:'Conference Paper', y:492},
-            {name:'Book Chapter', y:52},
-            {name:'Book', y:6}
-        ]
+        data: types
     }];
       
     opts = {
@@ -41,26 +45,14 @@ $(function() {
     
     var chart = new Chart('containerDistType', opts, series);
     chart.create();    
-});
+}
 
-$(function() {
+function drawYearChart(years){
     var series = [{
         name: '# of XD related publications',
-        data: [               
-            {name:'2005', y:21},
-            {name:'2006', y:237},
-            {name:'2007', y:280},
-            {name:'2008', y:289},
-            {name:'2009', y:488},
-            {name:'2010', y:670},
-            {name:'2011', y:757},
-            {name:'2012', y:1128},
-            {name:'2013', y:1718},
-            {name:'2014', y:1998},
-            {name:'2015', y:1561},
-            {name:'2016', y:872},
-            {name:'2017', y:5},
-        ]
+        data: years.categories.map(function(year, i){
+            return {name: year, y: years.data[i]};
+        })
     }];
     
     opts = {
@@ -75,21 +67,7 @@ $(function() {
             pointFormat: '{series.name}: <b>{point.y}</b>'
         },
         xAxis: {
-            categories: [
-                '2005',
-                '2006',
-                '2007',
-                '2008',                
-                '2009',                
-                '2010',                
-                '2011',                
-                '2012',               
-                '2013',                
-                '2014',               
-                '2015',                
-                '2016',                
-                '2017',                
-            ],
+            categories: years.categories,
             labels: {
                 rotation: -45,
                 align: 'right',
@@ -118,7 +96,7 @@ $(function() {
     
     var chart = new Chart('containerDistYear', opts, series);
     chart.create();
-});
+}
 
 $(function() {
     var chartData = fos.map(function(f){
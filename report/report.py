@@ -1,29 +1,215 @@
-import csv, datetime
-import requests
+'''Generate the XSEDE publications report
+
+Usage:
+  report.py [--refresh --pages --jobs=<jobs> --force]
+
+Options:
+  --refresh      download the data again if the published copy changed
+  --pages        also render one page per organization and per field of study
+  --jobs=<jobs>  processes rendering pages, defaults to the number of cores
+  --force        render every page, even if its inputs did not change
+'''
+
+import datetime, json, hashlib, os, re, multiprocessing
 import jinja2
+from docopt import docopt
+from data_source import DataSource
 
 html_file = 'report.html'
+template_dir = 'templates/'
+cache_dir = '.cache'
+manifest_file = os.path.join(cache_dir, 'build.json')
 
 fos_url = 'https://raw.githubusercontent.com/cloudmesh/metric/master/report/data-fos.csv'
 org_url = 'https://raw.githubusercontent.com/cloudmesh/metric/master/report/data-org.csv'
 
-def csv_to_json(req):
-    reader = csv.DictReader(req.splitlines())
-    json = []
-    for row in reader:
-        json.append(row)
-        
-    return json
-    
-fos = csv_to_json(requests.get(fos_url).text)
-org = csv_to_json(requests.get(org_url).text)
+fos_data = DataSource('data-fos.csv', fos_url, cache_dir)
+org_data = DataSource('data-org.csv', org_url, cache_dir)
+
+# metrics shown on pages, each with a recent variant
+page_metrics = ['# of Pubs', 'Cited by', 'H-index', 'G-index', 'i10-index']
+
+env = None
+
+def get_env():
+    '''Get the jinja environment of this process, compiled templates are cached on disk
+    Returns:
+        (Environment) -- jinja environment
+    '''
+    global env
+
+    if(env is None):
+        bytecode_dir = os.path.join(cache_dir, 'jinja')
+        if(not os.path.isdir(bytecode_dir)):
+            os.makedirs(bytecode_dir)
+
+        loader = jinja2.FileSystemLoader(searchpath = template_dir)
+        env = jinja2.Environment(loader = loader, bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_dir))
+
+    return env
+
+def render_page(task):
+    '''Render a template to a file, run in the process pool
+    Args:
+        task (tuple) -- (template name, output file, context)
+    Returns:
+        (string) -- output file
+    '''
+    template, output, context = task
+
+    directory = os.path.dirname(output)
+    if(directory and not os.path.isdir(directory)):
+        os.makedirs(directory)
+
+    out = get_env().get_template(template).render(now = datetime.datetime.now(), **context)
+
+    with open(output, 'w+') as f:
+        f.write(out.encode('utf-8'))
+
+    return output
+
+def slug(name):
+    '''Get a file name for a page
+    Args:
+        name (string) -- organization or field of study
+    Returns:
+        (string) -- lowercase words joined by dashes
+    '''
+    return re.sub('[^a-z0-9]+', '-', name.lower()).strip('-')
+
+class ReportBuilder:
+    '''Render the report and its pages, skipping outputs whose inputs did not change
+
+    The inputs of each output (template source and data) are hashed and the
+    hashes kept in a manifest, so an unchanged page is not rendered again.
+    '''
+    def __init__(self, jobs = None, force = False):
+        '''
+        Args:
+            jobs (int) -- processes rendering pages, defaults to the number of cores
+            force (bool) -- render every output
+        '''
+        self.jobs = int(jobs) if jobs else multiprocessing.cpu_count()
+        self.force = force
+        self.manifest = {}
+        self.templates = {}
+
+        if(os.path.isfile(manifest_file)):
+            with open(manifest_file) as f:
+                self.manifest = json.load(f)
+
+    def template_hash(self, name):
+        '''Hash a template source, once
+        Args:
+            name (string) -- template name
+        Returns:
+            (string) -- md5 of the template
+        '''
+        if(name not in self.templates):
+            with open(os.path.join(template_dir, name), 'rb') as f:
+                self.templates[name] = hashlib.md5(f.read()).hexdigest()
+
+        return self.templates[name]
+
+    def task(self, template, output, context):
+        '''Get a render task if the output is out of date
+        Args:
+            template (string) -- template name
+            output (string) -- output file
+            context (dict) -- template variables, JSON serializable
+        Returns:
+            (tuple) -- (task, hash), task is None if the output is up to date
+        '''
+        digest = hashlib.md5(self.template_hash(template) + json.dumps(context, sort_keys = True)).hexdigest()
+
+        if(not self.force and self.manifest.get(output) == digest and os.path.isfile(output)):
+            return None, digest
+
+        return (template, output, context), digest
+
+    def build(self, tasks):
+        '''Render out of date outputs
+        Args:
+            tasks (list) -- (template, output, context)
+        Returns:
+            (int) -- number of outputs rendered
+        '''
+        pending = []
+        for template, output, context in tasks:
+            task, digest = self.task(template, output, context)
+
+            if(task):
+                pending.append((task, digest))
+
+        if(len(pending) > 1 and self.jobs > 1):
+            pool = multiprocessing.Pool(self.jobs)
+            pool.map(render_page, [task for task, digest in pending], max(1, len(pending) // (self.jobs * 4)))
+            pool.close()
+            pool.join()
+        else:
+            for task, digest in pending:
+                render_page(task)
+
+        for (template, output, context), digest in pending:
+            self.manifest[output] = digest
+
+        return len(pending)
+
+    def save(self):
+        '''Write the manifest
+        '''
+        if(not os.path.isdir(cache_dir)):
+            os.makedirs(cache_dir)
+
+        with open(manifest_file, 'w') as f:
+            json.dump(self.manifest, f, indent = 2, sort_keys = True)
+
+def page_tasks(rows, key, directory):
+    '''Get a page task for every named row
+    Args:
+        rows (list) -- typed csv rows
+        key (string) -- name column
+        directory (string) -- output directory
+    Returns:
+        (list) -- (template, output, context)
+    '''
+    tasks = []
+    seen = {}
+    for row in rows:
+        if(row[key]):
+            # rows sharing a name get numbered pages
+            name = slug(row[key])
+            seen[name] = seen.get(name, 0) + 1
+            name = name if seen[name] == 1 else name + '-' + str(seen[name])
+
+            context = {'name': row[key], 'row': row, 'metrics': page_metrics}
+            tasks.append(('page.html', os.path.join(directory, name + '.html'), context))
+
+    return tasks
+
+def render(refresh = False, pages = False, jobs = None, force = False):
+    '''Render the report
+    Args:
+        refresh (bool) -- download the data again if the published copy changed
+        pages (bool) -- also render organization and field of study pages
+        jobs (int) -- processes rendering pages
+        force (bool) -- render every output, even if its inputs did not change
+    '''
+    fos = fos_data.load(refresh)
+    org = org_data.load(refresh)
+
+    builder = ReportBuilder(jobs, force)
+    tasks = [('report.html', html_file, {'fos': json.dumps(fos), 'org': json.dumps(org)})]
 
-loader = jinja2.FileSystemLoader(searchpath = 'templates/')
-env = jinja2.Environment(loader = loader)
+    if(pages):
+        tasks += page_tasks(org, 'Organization', 'orgs')
+        tasks += page_tasks(fos, 'fos', 'fos')
 
-template = env.get_template('report.html')
+    rendered = builder.build(tasks)
+    builder.save()
 
-out = template.render(fos = fos, org = org, now = datetime.datetime.now())
+    print str(rendered) + ' of ' + str(len(tasks)) + ' pages rendered, ' + str(len(tasks) - rendered) + ' unchanged.'
 
-with open(html_file, 'w+') as f:
-    f.write(out)
+if(__name__ == '__main__'):
+    arguments = docopt(__doc__)
+    render(refresh = arguments['--refresh'], pages = arguments['--pages'], jobs = arguments['--jobs'], force = arguments['--force'])